@@ -0,0 +1,227 @@
+"""
+Semantic Answer Cache
+
+This module provides a local cache of generated answers, keyed by the
+similarity of question embeddings, so repeated or paraphrased questions
+can be answered without another Bedrock round trip.
+"""
+import json
+import logging
+import math
+import operator
+import os
+import sqlite3
+import time
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+# NumPy scores every cached embedding in one matrix product when installed
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(Path.home(), ".cache", "bedrock_kb", "answers.db")
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+# Every lookup compares the question against all live entries, so keep the cache small
+# enough that a miss stays cheap next to a Bedrock round trip (about 40 ms in pure Python)
+DEFAULT_MAX_ENTRIES = 1000
+
+
+class SemanticCache:
+    """SQLite-backed answer cache matched by cosine similarity of question embeddings"""
+
+    def __init__(self,
+                 embed_fn: Callable[[str], List[float]],
+                 db_path: str = DEFAULT_CACHE_PATH,
+                 threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 ttl_seconds: int = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Initialize the cache
+
+        Args:
+            embed_fn: Function returning an embedding vector for a piece of text
+            db_path: Path to the SQLite database file
+            threshold: Minimum cosine similarity for a cached answer to be reused
+            ttl_seconds: Age in seconds after which cached answers are ignored
+            max_entries: Maximum number of answers kept; the oldest are evicted first
+        """
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS answer_cache ("
+            "id INTEGER PRIMARY KEY, "
+            "context TEXT, "
+            "embedding BLOB, "
+            "question TEXT, "
+            "answer TEXT, "
+            "ts REAL, "
+            "hits INTEGER DEFAULT 0)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS answer_cache_context ON answer_cache (context)")
+        self.conn.commit()
+
+    def lookup(self, question: str, context: str = "") -> Tuple[Optional[Dict[str, Any]], array]:
+        """
+        Find a cached answer for a question
+
+        The cache is only an optimization, so failures to embed the question or
+        read the database are logged and treated as a miss.
+
+        Args:
+            question: User question
+            context: Key separating answers that are not interchangeable
+                     (e.g. different knowledge bases)
+
+        Returns:
+            Tuple of (cached result or None, normalized question embedding,
+            or None if the question could not be embedded)
+        """
+        try:
+            embedding = self._embed(question)
+        except Exception as e:
+            logger.warning("Answer cache skipped, could not embed question: %s", e)
+            return None, None
+
+        cutoff = time.time() - self.ttl_seconds
+
+        try:
+            # Answers are only read for the best match, not for every row scanned
+            rows = self.conn.execute(
+                "SELECT id, embedding FROM answer_cache WHERE context = ? AND ts >= ?",
+                (context, cutoff)
+            ).fetchall()
+            best_id = self._best_match(embedding, rows)
+            if best_id is None:
+                return None, embedding
+
+            (answer,) = self.conn.execute("SELECT answer FROM answer_cache WHERE id = ?", (best_id,)).fetchone()
+            self.conn.execute("UPDATE answer_cache SET hits = hits + 1 WHERE id = ?", (best_id,))
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("Answer cache lookup failed: %s", e)
+            return None, embedding
+
+        return json.loads(answer), embedding
+
+    def _best_match(self, embedding: array, rows: List[Tuple[int, bytes]]) -> Optional[int]:
+        """
+        Find the cached question most similar to a question
+
+        Both vectors are normalized, so the dot product is the cosine similarity.
+
+        Args:
+            embedding: Normalized question embedding
+            rows: (id, embedding blob) of the cached questions to compare against
+
+        Returns:
+            ID of the best match at or above the threshold, or None
+        """
+        # Embeddings of another size come from a different model and can't be compared
+        size = len(embedding) * embedding.itemsize
+        rows = [row for row in rows if len(row[1]) == size]
+        if not rows:
+            return None
+
+        if np is not None:
+            matrix = np.frombuffer(b"".join(blob for _, blob in rows), dtype=np.float32)
+            scores = matrix.reshape(len(rows), len(embedding)) @ np.frombuffer(embedding, dtype=np.float32)
+            best = int(scores.argmax())
+            return rows[best][0] if scores[best] >= self.threshold else None
+
+        best_id = None
+        best_score = self.threshold
+        cached = array('f')
+        for row_id, blob in rows:
+            del cached[:]
+            cached.frombytes(blob)
+            score = sum(map(operator.mul, embedding, cached))
+            if score >= best_score:
+                best_id, best_score = row_id, score
+        return best_id
+
+    def store(self, question: str, embedding: array, result: Dict[str, Any], context: str = ""):
+        """
+        Store an answer in the cache
+
+        Expired answers, and the oldest answers beyond max_entries, are removed at the same time.
+        Database errors are logged and the answer is simply not cached.
+
+        Args:
+            question: User question
+            embedding: Normalized question embedding returned by lookup
+            result: Result dictionary to cache
+            context: Key separating answers that are not interchangeable
+        """
+        try:
+            self.conn.execute(
+                "INSERT INTO answer_cache (context, embedding, question, answer, ts) VALUES (?, ?, ?, ?, ?)",
+                (context, embedding.tobytes(), question, json.dumps(result, default=str), time.time())
+            )
+            self.conn.execute("DELETE FROM answer_cache WHERE ts < ?", (time.time() - self.ttl_seconds,))
+            self.conn.execute(
+                "DELETE FROM answer_cache WHERE id NOT IN "
+                "(SELECT id FROM answer_cache ORDER BY ts DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("Could not store answer in cache: %s", e)
+
+    def get_or_compute(self,
+                       question: str,
+                       compute_fn: Callable[[], Dict[str, Any]],
+                       context: str = "",
+                       should_store: Callable[[Dict[str, Any]], bool] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Return a cached answer, or compute and cache a new one
+
+        If the cache cannot be used (e.g. the embedding model is unavailable),
+        the answer is computed and returned without being cached.
+
+        Args:
+            question: User question
+            compute_fn: Function producing the result on a cache miss
+            context: Key separating answers that are not interchangeable
+            should_store: Optional predicate deciding whether a computed result is cached
+
+        Returns:
+            Tuple of (result, whether it came from the cache)
+        """
+        cached, embedding = self.lookup(question, context)
+        if cached is not None:
+            return cached, True
+
+        result = compute_fn()
+        if embedding is not None and (should_store is None or should_store(result)):
+            self.store(question, embedding, result, context)
+        return result, False
+
+    def clear(self):
+        """Remove all cached answers"""
+        self.conn.execute("DELETE FROM answer_cache")
+        self.conn.commit()
+
+    def _embed(self, text: str) -> array:
+        """
+        Embed and L2-normalize text
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            Normalized embedding as a float array
+        """
+        vector = self.embed_fn(text)
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return array('f', (v / norm for v in vector))
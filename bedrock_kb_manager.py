@@ -7,81 +7,83 @@ This script provides a unified interface for:
 3. Querying the knowledge base
 """
 import os
+import sys
 import argparse
+import hashlib
+import json
+import logging
+import sqlite3
 from pathlib import Path
 from dotenv import load_dotenv
 import time
 
-# Import our modules
-from s3_uploader import S3Uploader, verify_aws_credentials, setup_aws_credentials
-from kb_ingestion import KnowledgeBaseIngestor
-from kb_query import KnowledgeBaseQuerier, interactive_query_mode
+# Our modules pull in boto3, so they are imported inside the handlers that need them
+# to keep --help, argument errors and the setup command fast
 
-# Load environment variables
+logger = logging.getLogger(__name__)
+
+# Load environment variables (needed before building the parser for the --region default)
 load_dotenv()
 
+# Records what previous workflow runs completed, so re-runs only redo what changed
+WORKFLOW_STATE_FILE = ".bedrock_kb_state.json"
+MANIFEST_BLOCK_SIZE = 1024 * 1024
+
+# boto3 session shared by every client the handlers create
+_session = None
+
+
+def _get_session(region):
+    """
+    Get the shared boto3 session, creating it on first use
+    
+    Args:
+        region: AWS region
+        
+    Returns:
+        boto3 Session
+    """
+    global _session
+    if _session is None:
+        import boto3
+        _session = boto3.session.Session(region_name=region)
+    return _session
+
 
 def main():
     """Main function to parse arguments and perform operations"""
+    argv = sys.argv[1:]
+    
     parser = argparse.ArgumentParser(description="AWS Bedrock Knowledge Base Operations")
     subparsers = parser.add_subparsers(dest="command", help="Command to run")
     
-    # Upload documents command
-    upload_parser = subparsers.add_parser("upload", help="Upload documents to S3")
-    upload_parser.add_argument("--bucket", required=True, help="S3 bucket name")
-    upload_parser.add_argument("--prefix", default="documents/", help="S3 prefix/folder")
-    upload_parser.add_argument("--path", required=True, help="Local file or directory path to upload")
-    upload_parser.add_argument("--recursive", action="store_true", help="Upload directory recursively")
-    upload_parser.add_argument("--list", action="store_true", help="List existing files in bucket")
-    
-    # Create knowledge base command
-    create_parser = subparsers.add_parser("create", help="Create a new knowledge base")
-    create_parser.add_argument("--name", required=True, help="Knowledge base name")
-    create_parser.add_argument("--bucket", required=True, help="S3 bucket name")
-    create_parser.add_argument("--prefix", default="documents/", help="S3 prefix/folder")
-    
-    # List knowledge bases command
-    list_kb_parser = subparsers.add_parser("list-kb", help="List knowledge bases")
-    
-    # Ingest documents command
-    ingest_parser = subparsers.add_parser("ingest", help="Ingest documents into knowledge base")
-    ingest_parser.add_argument("--kb-id", required=True, help="Knowledge base ID")
-    ingest_parser.add_argument("--bucket", required=True, help="S3 bucket name")
-    ingest_parser.add_argument("--prefix", default="documents/", help="S3 prefix/folder")
-    ingest_parser.add_argument("--wait", action="store_true", help="Wait for ingestion to complete")
-    
-    # Query knowledge base command
-    query_parser = subparsers.add_parser("query", help="Query knowledge base")
-    query_parser.add_argument("--kb-id", required=True, help="Knowledge base ID")
-    query_parser.add_argument("question", nargs="?", help="Question to ask")
-    query_parser.add_argument("--raw", action="store_true", help="Return raw documents without LLM generation")
-    query_parser.add_argument("--max-results", type=int, default=3, help="Maximum number of results to retrieve")
-    query_parser.add_argument("--interactive", action="store_true", help="Run in interactive query mode")
-    
-    # Complete workflow command (upload, ingest, and query in one)
-    workflow_parser = subparsers.add_parser("workflow", help="Complete workflow: upload, ingest, and query")
-    workflow_parser.add_argument("--kb-id", help="Knowledge base ID (required if not creating a new KB)")
-    workflow_parser.add_argument("--bucket", required=True, help="S3 bucket name")
-    workflow_parser.add_argument("--path", required=True, help="Local file or directory path to upload")
-    workflow_parser.add_argument("--create-kb", action="store_true", help="Create a new knowledge base")
-    workflow_parser.add_argument("--kb-name", help="Name for the new knowledge base")
-    workflow_parser.add_argument("--question", help="Question to ask after ingestion")
-    workflow_parser.add_argument("--wait", action="store_true", help="Wait for ingestion to complete")
-    
-    # Setup command
-    setup_parser = subparsers.add_parser("setup", help="Set up AWS credentials")
+    # Only build the parser for the command being run; fall back to the full
+    # tree when the command is unknown or top-level help was requested
+    command = _find_command(argv)
+    for name, add_parser in _SUBCOMMAND_PARSERS.items():
+        if command is None or name == command:
+            add_parser(subparsers)
     
     # Global arguments
     parser.add_argument("--region", default=os.environ.get("AWS_REGION", "us-east-1"), help="AWS region")
+    parser.add_argument("--verbose", action="store_true", help="Show debug output such as every uploaded file")
+    parser.add_argument("--json-logs", action="store_true", help="Write log output to stderr as one JSON object per line")
+    parser.add_argument("--non-interactive", action="store_true",
+                        help="Never prompt; exit with an error if AWS credentials are missing")
     
     # Parse arguments
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    
+    from logging_config import configure_logging
+    configure_logging(args.verbose, args.json_logs)
     
     # Check if command specified
     if not args.command:
         parser.print_help()
         return
     
+    from s3_uploader import verify_aws_credentials, setup_aws_credentials
+    
     # Handle setup command
     if args.command == "setup":
         success = setup_aws_credentials()
@@ -91,10 +93,15 @@ def main():
             print("Failed to set up AWS credentials")
         return
     
-    # Verify credentials for all other commands
-    if args.command != "setup":
+    # Verify credentials for all other commands (a dry run makes no AWS calls)
+    if not getattr(args, "dry_run", False):
         verified, _ = verify_aws_credentials(args.region)
         if not verified:
+            # Fail fast instead of blocking on a prompt nobody can answer (CI, orchestrators)
+            if args.non_interactive or not sys.stdin.isatty():
+                print("Error: AWS credentials are not configured and no interactive terminal is available.")
+                print("Configure credentials (e.g. environment variables or an IAM role) and retry.")
+                sys.exit(2)
             setup = input("Would you like to set up AWS credentials now? (y/n): ")
             if setup.lower() == 'y':
                 if not setup_aws_credentials():
@@ -118,22 +125,153 @@ def main():
         handle_workflow_command(args)
 
 
+def _find_command(argv):
+    """
+    Find the subcommand named on the command line without building the parser
+    
+    Args:
+        argv: Command-line arguments (without the program name)
+        
+    Returns:
+        Subcommand name, or None if it is unknown or top-level help was requested
+    """
+    skip_value = False
+    for token in argv:
+        if skip_value:
+            skip_value = False
+        elif token == "--region":
+            skip_value = True
+        elif token in ("-h", "--help"):
+            return None
+        elif not token.startswith("-"):
+            return token if token in _SUBCOMMAND_PARSERS else None
+    return None
+
+
+def _add_upload_parser(subparsers):
+    """Add the upload documents command"""
+    upload_parser = subparsers.add_parser("upload", help="Upload documents to S3")
+    upload_parser.add_argument("--bucket", required=True, help="S3 bucket name")
+    upload_parser.add_argument("--prefix", default="documents/", help="S3 prefix/folder")
+    upload_parser.add_argument("--path", required=True, help="Local file or directory path to upload")
+    upload_parser.add_argument("--recursive", action="store_true", help="Upload directory recursively")
+    upload_parser.add_argument("--list", action="store_true", help="List existing files in bucket")
+    upload_parser.add_argument("--max-concurrency", type=int,
+                               help="Maximum number of parallel multipart upload threads (default: 16)")
+    upload_parser.add_argument("--chunk-size", type=int, default=16,
+                               help="Multipart upload chunk size in MiB (16-64 recommended)")
+    upload_parser.add_argument("--workers", type=int,
+                               help="Number of files to upload in parallel (default: 64)")
+
+
+def _add_create_parser(subparsers):
+    """Add the create knowledge base command"""
+    create_parser = subparsers.add_parser("create", help="Create a new knowledge base")
+    create_parser.add_argument("--name", required=True, help="Knowledge base name")
+    create_parser.add_argument("--bucket", required=True, help="S3 bucket name")
+    create_parser.add_argument("--prefix", default="documents/", help="S3 prefix/folder")
+
+
+def _add_list_kb_parser(subparsers):
+    """Add the list knowledge bases command"""
+    subparsers.add_parser("list-kb", help="List knowledge bases")
+
+
+def _add_ingest_parser(subparsers):
+    """Add the ingest documents command"""
+    ingest_parser = subparsers.add_parser("ingest", help="Ingest documents into knowledge base")
+    ingest_parser.add_argument("--kb-id", required=True, help="Knowledge base ID")
+    ingest_parser.add_argument("--bucket", required=True, help="S3 bucket name")
+    ingest_parser.add_argument("--prefix", default="documents/", help="S3 prefix/folder")
+    ingest_parser.add_argument("--wait", action="store_true", help="Wait for ingestion to complete")
+    ingest_parser.add_argument("--poll-interval-max", type=int,
+                               help="Maximum seconds between ingestion status checks (default: 60)")
+
+
+def _add_query_parser(subparsers):
+    """Add the query knowledge base command"""
+    query_parser = subparsers.add_parser("query", help="Query knowledge base")
+    query_parser.add_argument("--kb-id", required=True, help="Knowledge base ID")
+    query_parser.add_argument("question", nargs="?", help="Question to ask")
+    query_parser.add_argument("--raw", action="store_true", help="Return raw documents without LLM generation")
+    query_parser.add_argument("--max-results", type=int, default=3, help="Maximum number of results to retrieve")
+    query_parser.add_argument("--interactive", action="store_true", help="Run in interactive query mode")
+    query_parser.add_argument("--no-cache", action="store_true", help="Always query Bedrock instead of reusing cached answers")
+
+
+def _add_workflow_parser(subparsers):
+    """Add the complete workflow command (upload, ingest, and query in one)"""
+    workflow_parser = subparsers.add_parser("workflow", help="Complete workflow: upload, ingest, and query")
+    workflow_parser.add_argument("--kb-id", help="Knowledge base ID (required if not creating a new KB)")
+    workflow_parser.add_argument("--bucket", required=True, help="S3 bucket name")
+    workflow_parser.add_argument("--path", required=True, help="Local file or directory path to upload")
+    workflow_parser.add_argument("--create-kb", action="store_true",
+                                 help="Create a new knowledge base (a re-run for the same bucket and path "
+                                      "reuses the one it created unless --kb-name differs or --force is given)")
+    workflow_parser.add_argument("--kb-name", help="Name for the new knowledge base")
+    workflow_parser.add_argument("--question", help="Question to ask after ingestion")
+    workflow_parser.add_argument("--wait", action="store_true", help="Wait for ingestion to complete")
+    workflow_parser.add_argument("--poll-interval-max", type=int,
+                                 help="Maximum seconds between ingestion status checks (default: 60)")
+    workflow_parser.add_argument("--ingest-after", type=int, default=50,
+                                 help="Start ingesting once this many files have been uploaded")
+    workflow_parser.add_argument("--max-concurrency", type=int,
+                                 help="Maximum number of parallel multipart upload threads (default: 16)")
+    workflow_parser.add_argument("--chunk-size", type=int, default=16,
+                                 help="Multipart upload chunk size in MiB (16-64 recommended)")
+    workflow_parser.add_argument("--workers", type=int,
+                                 help="Number of files to upload in parallel (default: 64)")
+    workflow_parser.add_argument("--dry-run", action="store_true",
+                                 help="Show which files changed since the last run without touching AWS")
+    workflow_parser.add_argument("--force", action="store_true",
+                                 help="Ignore the state of previous runs and redo every step")
+
+
+def _add_setup_parser(subparsers):
+    """Add the set up AWS credentials command"""
+    subparsers.add_parser("setup", help="Set up AWS credentials")
+
+
+_SUBCOMMAND_PARSERS = {
+    "upload": _add_upload_parser,
+    "create": _add_create_parser,
+    "list-kb": _add_list_kb_parser,
+    "ingest": _add_ingest_parser,
+    "query": _add_query_parser,
+    "workflow": _add_workflow_parser,
+    "setup": _add_setup_parser,
+}
+
+
+def _make_uploader(args, prefix):
+    """Create an S3Uploader using the upload tuning arguments"""
+    from s3_uploader import S3Uploader, make_transfer_config, DEFAULT_MAX_CONCURRENCY, DEFAULT_UPLOAD_WORKERS, MiB
+    
+    transfer_config = make_transfer_config(
+        max_concurrency=args.max_concurrency or DEFAULT_MAX_CONCURRENCY,
+        multipart_chunksize=args.chunk_size * MiB
+    )
+    return S3Uploader(args.bucket, prefix, args.region, transfer_config=transfer_config,
+                      max_workers=args.workers or DEFAULT_UPLOAD_WORKERS,
+                      session=_get_session(args.region))
+
+
 def handle_upload_command(args):
     """Handle upload command"""
-    uploader = S3Uploader(args.bucket, args.prefix, args.region)
+    uploader = _make_uploader(args, args.prefix)
     
     if args.list:
-        files = uploader.list_bucket_contents()
+        files = uploader.list_bucket_contents_parallel(include_metadata=True)
         print(f"\nFiles in s3://{args.bucket}/{args.prefix}:")
         for file in files:
-            print(f" - {file}")
+            modified = file['LastModified'].strftime('%Y-%m-%d %H:%M:%S')
+            print(f" - {file['Key']} ({file['Size']} bytes, modified {modified})")
     
     if args.path:
         path = Path(args.path)
         if path.is_dir():
             print(f"Uploading directory {path} to S3...")
-            uploaded = uploader.upload_directory(path, recursive=args.recursive)
-            print(f"Uploaded {len(uploaded)} files to S3")
+            uploader.upload_directory(path, recursive=args.recursive)
         elif path.is_file():
             print(f"Uploading file {path} to S3...")
             success, s3_key = uploader.upload_file(path)
@@ -147,7 +285,9 @@ def handle_upload_command(args):
 
 def handle_create_command(args):
     """Handle create knowledge base command"""
-    ingestor = KnowledgeBaseIngestor(args.region)
+    from kb_ingestion import KnowledgeBaseIngestor
+    
+    ingestor = KnowledgeBaseIngestor(args.region, session=_get_session(args.region))
     
     kb_id = ingestor.create_knowledge_base(
         kb_name=args.name,
@@ -165,7 +305,9 @@ def handle_create_command(args):
 
 def handle_list_kb_command(args):
     """Handle list knowledge bases command"""
-    ingestor = KnowledgeBaseIngestor(args.region)
+    from kb_ingestion import KnowledgeBaseIngestor
+    
+    ingestor = KnowledgeBaseIngestor(args.region, session=_get_session(args.region))
     kbs = ingestor.list_knowledge_bases()
     
     if not kbs:
@@ -183,7 +325,9 @@ def handle_list_kb_command(args):
 
 def handle_ingest_command(args):
     """Handle ingest command"""
-    ingestor = KnowledgeBaseIngestor(args.region)
+    from kb_ingestion import KnowledgeBaseIngestor
+    
+    ingestor = KnowledgeBaseIngestor(args.region, session=_get_session(args.region))
     
     # Create data source name with timestamp
     ds_name = f"s3-source-{int(time.time())}"
@@ -202,7 +346,8 @@ def handle_ingest_command(args):
     print(f"Ingestion job started with ID: {job_id}")
     
     if args.wait:
-        ingestor.wait_for_ingestion(args.kb_id, ds_id, job_id)
+        ingestor.wait_for_ingestion(args.kb_id, ds_id, job_id,
+                                    max_poll_interval=args.poll_interval_max)
     else:
         print("\nIngestion job is running in the background.")
         print("To monitor progress, run:")
@@ -211,16 +356,26 @@ def handle_ingest_command(args):
 
 def handle_query_command(args):
     """Handle query command"""
+    from kb_query import KnowledgeBaseQuerier, interactive_query_mode
+    from answer_cache import SemanticCache
+    
+    session = _get_session(args.region)
+    querier = KnowledgeBaseQuerier(args.kb_id, args.region, session=session)
+    if not args.no_cache:
+        try:
+            querier.answer_cache = SemanticCache(querier.embed_text)
+        except (OSError, sqlite3.Error) as e:
+            # The cache only saves Bedrock calls, so answer without it
+            logger.warning("Answer cache unavailable, continuing without it: %s", e)
+    
     if args.interactive:
-        interactive_query_mode(args.kb_id, args.region)
+        interactive_query_mode(args.kb_id, args.region, answer_cache=querier.answer_cache, session=session)
         return
     
     if not args.question:
         print("Error: Please provide a question or use --interactive mode")
         return
     
-    querier = KnowledgeBaseQuerier(args.kb_id, args.region)
-    
     try:
         if args.raw:
             # Just retrieve relevant documents
@@ -244,6 +399,8 @@ def handle_query_command(args):
             # Generate answer with LLM
             print("Querying knowledge base and generating answer...")
             result = querier.query_with_llm_generation(args.question, args.max_results)
+            if result.get('from_cache'):
+                print("(answer served from cache)")
             
             print("\n" + "=" * 80)
             print(f"Question: {result['question']}")
@@ -263,35 +420,172 @@ def handle_query_command(args):
         print(f"Error querying knowledge base: {str(e)}")
 
 
+def _file_sha256(file_path):
+    """
+    Compute the SHA-256 digest of a file
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(MANIFEST_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _build_manifest(files, root):
+    """
+    Build a manifest of file contents for change detection
+    
+    Args:
+        files: Paths of the files
+        root: Directory (or single file) the paths were found under
+        
+    Returns:
+        Dictionary of {relative path: sha256}, in the same order as files
+    """
+    root = Path(root)
+    base = root if root.is_dir() else root.parent
+    return {Path(f).relative_to(base).as_posix(): _file_sha256(f) for f in files}
+
+
+def _load_workflow_state():
+    """
+    Load the state recorded by previous workflow runs
+    
+    Returns:
+        Dictionary of per-run state keyed by "bucket:path"
+    """
+    try:
+        with open(WORKFLOW_STATE_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_workflow_state(all_state):
+    """
+    Persist workflow state so re-runs can skip work that already succeeded
+    
+    Args:
+        all_state: Dictionary of per-run state keyed by "bucket:path"
+    """
+    with open(WORKFLOW_STATE_FILE, "w") as f:
+        json.dump(all_state, f, indent=2)
+
+
+def _upload_and_start_ingestion(uploader, ingestor, files, kb_id, ds_id, ingest_after):
+    """
+    Upload files, starting an ingestion job as soon as the first batch of files is in S3
+    
+    Args:
+        uploader: S3Uploader to upload with
+        ingestor: KnowledgeBaseIngestor to start the ingestion job with
+        files: Paths of the files to upload
+        kb_id: Knowledge base ID
+        ds_id: Data source ID
+        ingest_after: Number of uploaded files that triggers the early ingestion job
+        
+    Returns:
+        Tuple of (uploaded S3 keys, early ingestion job ID or None,
+                  number of files uploaded when the job started)
+    """
+    progress = {"uploaded": 0, "job_id": None, "uploaded_before_job": 0}
+    
+    def on_uploaded(s3_key):
+        progress["uploaded"] += 1
+        if progress["job_id"] is None and progress["uploaded"] >= ingest_after:
+            progress["job_id"] = ingestor.start_ingestion(kb_id, ds_id)
+            progress["uploaded_before_job"] = progress["uploaded"]
+            print(f"Started ingestion job {progress['job_id']} after {progress['uploaded']} files were uploaded")
+    
+    uploaded = uploader.upload_files(files, on_uploaded=on_uploaded)
+    return uploaded, progress["job_id"], progress["uploaded_before_job"]
+
+
 def handle_workflow_command(args):
     """Handle complete workflow command"""
-    # Step 1: Upload documents
-    print("Step 1: Uploading documents...")
-    uploader = S3Uploader(args.bucket, "documents/", args.region)
+    from kb_ingestion import KnowledgeBaseIngestor
+    from kb_query import KnowledgeBaseQuerier
     
     path = Path(args.path)
-    if path.is_dir():
-        print(f"Uploading directory {path} to S3...")
-        uploaded = uploader.upload_directory(path, recursive=True)
-        print(f"Uploaded {len(uploaded)} files to S3")
-    elif path.is_file():
-        print(f"Uploading file {path} to S3...")
-        success, s3_key = uploader.upload_file(path)
-        if success:
-            print(f"Successfully uploaded to {s3_key}")
-        else:
-            print(f"Failed to upload {path}")
-            return
-    else:
+    if not path.exists():
         print(f"Error: Path {path} not found")
         return
     
-    # Step 2: Create KB or use existing
-    kb_id = args.kb_id
-    ingestor = KnowledgeBaseIngestor(args.region)
+    # Walk the local tree once; the same file list scopes the data source and drives the upload
+    uploader = _make_uploader(args, "documents/")
+    files = uploader.list_directory(path, recursive=True) if path.is_dir() else [path]
+    if not files:
+        print(f"Error: No files found in {path}")
+        return
+    # Files are uploaded flat into the uploader's folder, so scope a directory's data source
+    # on that folder; a character-wise common prefix of the keys could end mid-name
+    # (e.g. "documents/alp") and would change whenever a file is added
+    inclusion_prefix = uploader.prefix if path.is_dir() else uploader.key_for(path)
+    
+    # Compare against the previous run so only changed files are uploaded
+    state_key = f"{args.bucket}:{path.resolve()}"
+    all_state = _load_workflow_state()
+    previous = {} if args.force else all_state.get(state_key, {})
+    manifest = _build_manifest(files, path)
+    previous_manifest = previous.get("manifest", {})
+    changed_files = [f for f, rel_path in zip(files, manifest) if previous_manifest.get(rel_path) != manifest[rel_path]]
+    
+    # The previous data source and job only apply to the same knowledge base and scope
+    kb_id = args.kb_id or (None if args.create_kb else os.environ.get("AWS_KNOWLEDGE_BASE_ID"))
+    # Re-running --create-kb for the same bucket and path resumes the knowledge base it
+    # created, unless --kb-name asks for a different one (or --force discarded the state)
+    resume_kb = (args.create_kb and not args.kb_id and previous.get("kb_id") and
+                 args.kb_name in (None, previous.get("kb_name")))
+    if resume_kb:
+        kb_id = previous["kb_id"]
+    reuse_data_source = (previous.get("kb_id") == kb_id and
+                         previous.get("inclusion_prefix") == inclusion_prefix and
+                         previous.get("ds_id"))
+    # A data source recorded for the same knowledge base but not reused is replaced, so the
+    # documents it indexed aren't indexed a second time by the new one
+    recorded = all_state.get(state_key, {})
+    replaced_ds_id = None
+    if kb_id and not reuse_data_source and recorded.get("kb_id") == kb_id:
+        replaced_ds_id = recorded.get("replaced_ds_id") or recorded.get("ds_id")
+    
+    if args.dry_run:
+        print(f"Dry run: {len(changed_files)} of {len(files)} files changed since the last run")
+        for file_path in changed_files:
+            print(f" - {file_path}")
+        if resume_kb:
+            print(f"Knowledge base: {kb_id} (created by a previous run; --force creates a new one)")
+        else:
+            print(f"Knowledge base: {kb_id or 'new (would be created)'}")
+        if reuse_data_source:
+            print(f"Data source: {previous['ds_id']} (reused)")
+        else:
+            print(f"Data source: new (including s3://{args.bucket}/{inclusion_prefix})")
+            if replaced_ds_id:
+                print(f"Data source {replaced_ds_id} from the previous run would be deleted")
+        return
+    
+    state = previous if reuse_data_source else {}
+    state["inclusion_prefix"] = inclusion_prefix
+    if replaced_ds_id:
+        # Kept until it is deleted, in case this run stops before then
+        state["replaced_ds_id"] = replaced_ds_id
+    state.setdefault("manifest", previous_manifest)
+    
+    def save_state():
+        all_state[state_key] = state
+        _save_workflow_state(all_state)
+    
+    # Step 1: Create KB or use existing
+    ingestor = KnowledgeBaseIngestor(args.region, session=_get_session(args.region))
     
-    if args.create_kb:
-        print("\nStep 2: Creating knowledge base...")
+    if args.create_kb and not kb_id:
+        print("Step 1: Creating knowledge base...")
         kb_name = args.kb_name or f"KB-{int(time.time())}"
         kb_id = ingestor.create_knowledge_base(
             kb_name=kb_name,
@@ -299,36 +593,116 @@ def handle_workflow_command(args):
             s3_prefix="documents/"
         )
         print(f"Created knowledge base with ID: {kb_id}")
+        state["kb_name"] = kb_name
+    elif resume_kb:
+        print(f"Step 1: Reusing knowledge base {kb_id} created by a previous --create-kb run "
+              f"for this bucket and path")
+        print("Pass --force to create a new knowledge base instead, or --kb-name with a different name")
+        state["kb_name"] = previous.get("kb_name")
     else:
-        if not kb_id:
-            kb_id = os.environ.get("AWS_KNOWLEDGE_BASE_ID")
-            
         if not kb_id:
             print("Error: No knowledge base ID provided. Use --kb-id or --create-kb")
             return
             
-        print(f"\nStep 2: Using existing knowledge base: {kb_id}")
-    
-    # Step 3: Ingest documents
-    print("\nStep 3: Ingesting documents...")
-    ds_name = f"s3-source-{int(time.time())}"
-    ds_id = ingestor.add_s3_data_source(
-        kb_id=kb_id,
-        name=ds_name,
-        s3_bucket=args.bucket,
-        s3_prefix="documents/"
-    )
-    print(f"Created data source with ID: {ds_id}")
-    
-    job_id = ingestor.start_ingestion(kb_id, ds_id)
-    print(f"Started ingestion job with ID: {job_id}")
-    
-    if args.wait:
-        ingestor.wait_for_ingestion(kb_id, ds_id, job_id)
+        print(f"Step 1: Using existing knowledge base: {kb_id}")
+    state["kb_id"] = kb_id
+    save_state()
+    
+    # Step 2: Add the data source up front so ingestion can start while uploads are still running
+    if reuse_data_source:
+        ds_id = state["ds_id"]
+        print(f"\nStep 2: Reusing data source from the previous run: {ds_id}")
+    else:
+        print("\nStep 2: Adding data source...")
+        if replaced_ds_id:
+            print(f"Deleting data source {replaced_ds_id} recorded by the previous run")
+            ingestor.delete_data_source(kb_id, replaced_ds_id)
+            state.pop("replaced_ds_id")
+            save_state()
+        ds_name = f"s3-source-{int(time.time())}"
+        ds_id = ingestor.add_s3_data_source(
+            kb_id=kb_id,
+            name=ds_name,
+            s3_bucket=args.bucket,
+            inclusion_prefix=inclusion_prefix
+        )
+        print(f"Created data source with ID: {ds_id} (including s3://{args.bucket}/{inclusion_prefix})")
+        state["ds_id"] = ds_id
+        state.pop("job_id", None)
+        save_state()
+    
+    # Step 3: Upload documents and ingest them
+    print("\nStep 3: Uploading and ingesting documents...")
+    job_id = None
+    # Files uploaded after the early ingestion job started, still waiting for a follow-up sync
+    pending_files = 0
+    
+    if not changed_files:
+        print("No files changed since the last run, skipping upload")
+        last_job_id = state.get("job_id")
+        if (last_job_id and not state.get("sync_pending") and
+                ingestor.get_ingestion_job_status(kb_id, ds_id, last_job_id).get("status") == "COMPLETE"):
+            print(f"Last ingestion job {last_job_id} completed successfully, skipping ingestion")
+            job_id = last_job_id
+    else:
+        print(f"Uploading {len(changed_files)} of {len(files)} files from {path} to S3...")
+        uploaded, job_id, uploaded_before_job = _upload_and_start_ingestion(
+            uploader, ingestor, changed_files, kb_id, ds_id, args.ingest_after
+        )
+        
+        # Record what reached S3 so a retry only re-uploads what is still missing
+        uploaded_keys = set(uploaded)
+        for file_path, rel_path in zip(files, manifest):
+            if uploader.key_for(file_path) in uploaded_keys:
+                state["manifest"][rel_path] = manifest[rel_path]
+        if job_id:
+            # The new job syncs everything already in S3, including any sync left pending before
+            state["job_id"] = job_id
+            state.pop("sync_pending", None)
+        save_state()
+        
+        if not uploaded:
+            print("No files were uploaded")
+            return
+        
+        if job_id and len(uploaded) > uploaded_before_job:
+            # Only one ingestion job can run per data source, so the files that landed after
+            # the early job started are picked up by an incremental follow-up sync
+            pending_files = len(uploaded) - uploaded_before_job
+            if args.wait:
+                print(f"Waiting for ingestion job {job_id} before syncing the remaining "
+                      f"{pending_files} files...")
+                job_info = ingestor.wait_for_ingestion(kb_id, ds_id, job_id,
+                                                       max_poll_interval=args.poll_interval_max)
+                if job_info.get("status") in ["COMPLETE", "FAILED", "STOPPED"]:
+                    job_id = None
+                    pending_files = 0
+    
+    if job_id is None:
+        job_id = ingestor.start_ingestion(kb_id, ds_id)
+        print(f"Started ingestion job with ID: {job_id}")
+        state["job_id"] = job_id
+        state.pop("sync_pending", None)
+        save_state()
+    
+    if pending_files:
+        # Recorded so a re-run starts the sync even though no files changed
+        state["sync_pending"] = True
+        save_state()
+        print(f"\nIngestion job {job_id} is still running; the {pending_files} files uploaded after it "
+              "started need a follow-up sync once it finishes.")
+        print("To monitor progress, run:")
+        print(f"python kb_ingestion.py monitor --kb-id {kb_id} --ds-id {ds_id} --job-id {job_id}")
+        print("Then start the sync with:")
+        print(f"python kb_ingestion.py ingest --kb-id {kb_id} --ds-id {ds_id}")
+        print("(re-running this workflow also starts it)")
+    elif args.wait:
+        ingestor.wait_for_ingestion(kb_id, ds_id, job_id,
+                                    max_poll_interval=args.poll_interval_max)
         if args.question:
             # Step 4: Query KB
             print("\nStep 4: Querying knowledge base...")
-            querier = KnowledgeBaseQuerier(kb_id, args.region)
+            querier = KnowledgeBaseQuerier(kb_id, args.region, session=_get_session(args.region))
             result = querier.query_with_llm_generation(args.question)
             
             print("\n" + "=" * 80)
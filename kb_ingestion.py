@@ -3,31 +3,230 @@ Knowledge Base Ingestion Module
 
 This module provides functions for ingesting documents into an AWS Bedrock Knowledge Base.
 """
-import boto3
+import asyncio
+import copy
+import functools
+import inspect
 import json
+import logging
 import time
 import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from typing import Dict, List, Any, Optional, Union
 from dotenv import load_dotenv
-from s3_uploader import verify_aws_credentials, setup_aws_credentials
+
+# boto3/botocore (and s3_uploader, which pulls in boto3) are imported where they
+# are first needed, so importing this module for its constants stays cheap
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
+# Region used when none is given, resolved once after .env is loaded
+_DEFAULT_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+
+# Delay before the first ingestion job status re-check, and its upper bound
+DEFAULT_INITIAL_POLL_INTERVAL = 2
+DEFAULT_MAX_POLL_INTERVAL = 60
+
+# GetIngestionJob statistics reported while waiting; a change in any of them is progress
+_INGESTION_STAT_FIELDS = (
+    "numberOfDocumentsScanned",
+    "numberOfNewDocumentsIndexed",
+    "numberOfModifiedDocumentsIndexed",
+    "numberOfDocumentsDeleted",
+    "numberOfDocumentsFailed"
+)
+
+# Trust policy letting Bedrock assume the knowledge base execution role
+_KB_TRUST_POLICY_JSON = json.dumps({
+    "Version": "2012-10-17",
+    "Statement": [
+        {
+            "Effect": "Allow",
+            "Principal": {
+                "Service": "bedrock.amazonaws.com"
+            },
+            "Action": "sts:AssumeRole"
+        }
+    ]
+})
+
+# Managed policies attached to a newly created execution role (Bedrock access, S3 read access)
+_KB_ROLE_POLICY_ARNS = (
+    'arn:aws:iam::aws:policy/AmazonBedrockFullAccess',
+    'arn:aws:iam::aws:policy/AmazonS3ReadOnlyAccess',
+)
+
+# Vector index field names used for every knowledge base (read-only, shared)
+_FIELD_MAPPING = MappingProxyType({
+    "vectorField": "vector",
+    "textField": "text",
+    "metadataField": "metadata"
+})
+
+# Seconds a knowledge base / data source description is reused before it is fetched again
+RESPONSE_CACHE_TTL = 30
+
+# Data sources ingested at once by quickingest_many (keeps well within Bedrock TPS quotas)
+DEFAULT_INGEST_CONCURRENCY = 16
+
+# HTTP connections kept per client, enough for concurrent ingestion without queueing for sockets
+CLIENT_POOL_SIZE = 64
+
+# OpenSearch Serverless has no built-in waiters, so define one that polls
+# BatchGetCollection until the collection is ACTIVE (or FAILED). Its delay and
+# maxAttempts are set per stage of _COLLECTION_WAIT_STAGES
+_COLLECTION_WAITER_CONFIG = {
+    "version": 2,
+    "waiters": {
+        "CollectionActive": {
+            "operation": "BatchGetCollection",
+            "acceptors": [
+                {
+                    "matcher": "path",
+                    "argument": "collectionDetails[0].status",
+                    "expected": "ACTIVE",
+                    "state": "success"
+                },
+                {
+                    "matcher": "path",
+                    "argument": "collectionDetails[0].status",
+                    "expected": "FAILED",
+                    "state": "failure"
+                }
+            ]
+        }
+    }
+}
+
+# (seconds between checks, number of checks) for each stage of the collection wait.
+# A waiter only polls at a fixed delay, so one waiter runs per stage to back off
+# from a first re-check after 5s to one check a minute, for about 20 minutes in total
+_COLLECTION_WAIT_STAGES = ((5, 2), (10, 2), (20, 2), (40, 2), (60, 17))
+
+
+@functools.lru_cache(maxsize=None)
+def _default_session(region: str):
+    """
+    Get a boto3 session for a region, created once per process
+    
+    Args:
+        region: AWS region
+        
+    Returns:
+        Cached boto3 Session
+    """
+    import boto3
+    return boto3.session.Session(region_name=region)
+
+
+@functools.lru_cache(maxsize=None)
+def _client_config():
+    """
+    Get the botocore config shared by the ingestor's clients
+    
+    Adaptive retries back off client-side when Bedrock throttles, and a larger
+    keep-alive pool lets concurrent ingestion reuse connections.
+    
+    Returns:
+        botocore Config
+    """
+    from botocore.config import Config
+    return Config(
+        retries={'mode': 'adaptive', 'max_attempts': 10},
+        max_pool_connections=CLIENT_POOL_SIZE,
+        tcp_keepalive=True
+    )
+
+
+def _cached_response(method):
+    """
+    Cache a read-only lookup per ingestor and arguments for RESPONSE_CACHE_TTL seconds
+    
+    Empty results are not cached, since the wrapped methods also return them on error.
+    Keyword and positional calls share an entry, and every caller gets its own copy
+    of the response, so mutating a result never changes what later calls see.
+    
+    Args:
+        method: KnowledgeBaseIngestor method to wrap
+        
+    Returns:
+        Wrapped method
+    """
+    signature = inspect.signature(method)
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (method.__name__,) + bound.args[1:]
+        now = time.monotonic()
+        
+        with self._cache_lock:
+            cached = self._response_cache.get(key)
+        if cached is not None and cached[0] > now:
+            return copy.deepcopy(cached[1])
+        
+        result = method(self, *args, **kwargs)
+        if result:
+            with self._cache_lock:
+                self._response_cache[key] = (now + RESPONSE_CACHE_TTL, copy.deepcopy(result))
+        return result
+    
+    return wrapper
+
 
 class KnowledgeBaseIngestor:
     """Class for ingesting documents into AWS Bedrock Knowledge Base"""
     
-    def __init__(self, region=None):
+    def __init__(self, region=None, session=None):
         """
         Initialize with AWS region
         
         Args:
             region: AWS region
+            session: Optional boto3 Session to create clients from (shared to avoid
+                     repeated credential and endpoint resolution)
         """
-        self.region = region or os.environ.get('AWS_REGION', 'us-east-1')
-        self.bedrock_agent = boto3.client('bedrock-agent', region_name=self.region)
-        self.s3 = boto3.client('s3', region_name=self.region)
+        self.region = region or _DEFAULT_REGION
+        self.session = session or _default_session(self.region)
+        self.bedrock_agent = self.session.client('bedrock-agent', region_name=self.region,
+                                                 config=_client_config())
+        self.s3 = self.session.client('s3', region_name=self.region, config=_client_config())
+        self._model_arn_prefix = f"arn:aws:bedrock:{self.region}::foundation-model/"
+        
+        # Responses of read-only lookups, keyed by (method name, *args)
+        self._response_cache = {}
+        self._cache_lock = threading.Lock()
+    
+    @functools.cached_property
+    def opensearch(self):
+        """OpenSearch Serverless client, created on first use"""
+        return self.session.client('opensearchserverless', region_name=self.region,
+                                   config=_client_config())
+    
+    @functools.cached_property
+    def iam(self):
+        """IAM client, created on first use"""
+        return self.session.client('iam', config=_client_config())
+    
+    def _invalidate(self, method_name: str, *args):
+        """
+        Drop cached responses of a lookup after a change that affects it
+        
+        Args:
+            method_name: Name of the cached method
+            *args: Arguments of the entry to drop (all entries of the method if omitted)
+        """
+        with self._cache_lock:
+            for key in list(self._response_cache):
+                if key[0] == method_name and (not args or key[1:] == args):
+                    del self._response_cache[key]
         
     def create_knowledge_base(self, 
                             kb_name: str,
@@ -49,19 +248,19 @@ class KnowledgeBaseIngestor:
             Knowledge Base ID
         """
         
-        print(f"Creating knowledge base: {kb_name}")
-        print(f"Using S3 bucket: {s3_bucket}/{s3_prefix}")
+        logger.info("Creating knowledge base: %s", kb_name)
+        logger.info("Using S3 bucket: %s/%s", s3_bucket, s3_prefix)
         
         if not vector_store_name:
             vector_store_name = f"{kb_name}-vectors"
         
         # Create vector collection for storage
         collection_arn = self._create_vector_collection(vector_store_name)
-        print(f"Created vector collection: {vector_store_name}")
+        logger.info("Created vector collection: %s", vector_store_name)
         
         # Get or create IAM role
         role_arn = self._get_or_create_kb_role()
-        print(f"Using IAM role: {role_arn}")
+        logger.info("Using IAM role: %s", role_arn)
         
         # Configuration for Knowledge Base
         kb_config = {
@@ -71,7 +270,7 @@ class KnowledgeBaseIngestor:
             "knowledgeBaseConfiguration": {
                 "type": "VECTOR",
                 "vectorKnowledgeBaseConfiguration": {
-                    "embeddingModelArn": f"arn:aws:bedrock:{self.region}::foundation-model/{embedding_model}"
+                    "embeddingModelArn": self._model_arn_prefix + embedding_model
                 }
             },
             "storageConfiguration": {
@@ -79,11 +278,8 @@ class KnowledgeBaseIngestor:
                 "opensearchServerlessConfiguration": {
                     "collectionArn": collection_arn,
                     "vectorIndexName": f"{kb_name}-index",
-                    "fieldMapping": {
-                        "vectorField": "vector",
-                        "textField": "text",
-                        "metadataField": "metadata"
-                    }
+                    # botocore's parameter validation only accepts real dicts
+                    "fieldMapping": dict(_FIELD_MAPPING)
                 }
             }
         }
@@ -91,14 +287,16 @@ class KnowledgeBaseIngestor:
         try:
             response = self.bedrock_agent.create_knowledge_base(**kb_config)
             kb_id = response['knowledgeBase']['knowledgeBaseId']
-            print(f"Knowledge Base created with ID: {kb_id}")
+            self._invalidate('list_knowledge_bases')
+            logger.info("Knowledge Base created with ID: %s", kb_id)
             
             return kb_id
             
         except Exception as e:
-            print(f"Error creating Knowledge Base: {str(e)}")
+            logger.error("Error creating Knowledge Base: %s", e)
             raise
     
+    @_cached_response
     def list_knowledge_bases(self) -> List[Dict]:
         """
         List all knowledge bases in the account
@@ -107,12 +305,14 @@ class KnowledgeBaseIngestor:
             List of knowledge base details
         """
         try:
-            response = self.bedrock_agent.list_knowledge_bases()
-            return response.get('knowledgeBaseSummaries', [])
+            paginator = self.bedrock_agent.get_paginator('list_knowledge_bases')
+            pages = paginator.paginate(PaginationConfig={'PageSize': 100})
+            return [kb for page in pages for kb in page.get('knowledgeBaseSummaries', [])]
         except Exception as e:
-            print(f"Error listing knowledge bases: {str(e)}")
+            logger.error("Error listing knowledge bases: %s", e)
             return []
     
+    @_cached_response
     def get_knowledge_base(self, kb_id: str) -> Dict:
         """
         Get details about a specific knowledge base
@@ -127,10 +327,11 @@ class KnowledgeBaseIngestor:
             response = self.bedrock_agent.get_knowledge_base(knowledgeBaseId=kb_id)
             return response.get('knowledgeBase', {})
         except Exception as e:
-            print(f"Error getting knowledge base details: {str(e)}")
+            logger.error("Error getting knowledge base details: %s", e)
             return {}
     
-    def add_s3_data_source(self, kb_id: str, name: str, s3_bucket: str, s3_prefix: str = "documents/") -> str:
+    def add_s3_data_source(self, kb_id: str, name: str, s3_bucket: str, s3_prefix: str = "documents/",
+                           inclusion_prefix: str = None) -> str:
         """
         Add S3 data source to knowledge base
         
@@ -139,12 +340,16 @@ class KnowledgeBaseIngestor:
             name: Data source name
             s3_bucket: S3 bucket name
             s3_prefix: S3 prefix/folder
+            inclusion_prefix: Exact key prefix to include, used as-is instead of the
+                              s3_prefix folder (e.g. the common prefix of known keys)
             
         Returns:
             Data source ID
         """
-        # Ensure prefix ends with /
-        if not s3_prefix.endswith('/'):
+        if inclusion_prefix:
+            s3_prefix = inclusion_prefix
+        elif not s3_prefix.endswith('/'):
+            # Ensure folder prefix ends with /
             s3_prefix += '/'
         
         data_source_config = {
@@ -163,12 +368,31 @@ class KnowledgeBaseIngestor:
         try:
             response = self.bedrock_agent.create_data_source(**data_source_config)
             ds_id = response['dataSource']['dataSourceId']
+            self._invalidate('list_data_sources', kb_id)
             return ds_id
             
         except Exception as e:
-            print(f"Error creating data source: {str(e)}")
+            logger.error("Error creating data source: %s", e)
             raise
     
+    def delete_data_source(self, kb_id: str, ds_id: str):
+        """
+        Delete a data source from a knowledge base, along with the documents it indexed
+        
+        Args:
+            kb_id: Knowledge base ID
+            ds_id: Data source ID (a data source that no longer exists is ignored)
+        """
+        from botocore.exceptions import ClientError
+        
+        try:
+            self.bedrock_agent.delete_data_source(knowledgeBaseId=kb_id, dataSourceId=ds_id)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ResourceNotFoundException':
+                logger.error("Error deleting data source: %s", e)
+                raise
+        self._invalidate('list_data_sources', kb_id)
+    
     def start_ingestion(self, kb_id: str, ds_id: str) -> str:
         """
         Start ingestion job for a data source
@@ -190,7 +414,7 @@ class KnowledgeBaseIngestor:
             return job_id
                 
         except Exception as e:
-            print(f"Error starting ingestion job: {str(e)}")
+            logger.error("Error starting ingestion job: %s", e)
             raise
     
     def get_ingestion_job_status(self, kb_id: str, ds_id: str, job_id: str) -> Dict:
@@ -213,9 +437,10 @@ class KnowledgeBaseIngestor:
             )
             return response.get('ingestionJob', {})
         except Exception as e:
-            print(f"Error getting ingestion job status: {str(e)}")
+            logger.error("Error getting ingestion job status: %s", e)
             return {}
     
+    @_cached_response
     def list_data_sources(self, kb_id: str) -> List[Dict]:
         """
         List all data sources for a knowledge base
@@ -227,74 +452,177 @@ class KnowledgeBaseIngestor:
             List of data sources
         """
         try:
-            response = self.bedrock_agent.list_data_sources(knowledgeBaseId=kb_id)
-            return response.get('dataSourceSummaries', [])
+            paginator = self.bedrock_agent.get_paginator('list_data_sources')
+            pages = paginator.paginate(knowledgeBaseId=kb_id, PaginationConfig={'PageSize': 100})
+            return [ds for page in pages for ds in page.get('dataSourceSummaries', [])]
         except Exception as e:
-            print(f"Error listing data sources: {str(e)}")
+            logger.error("Error listing data sources: %s", e)
             return []
     
-    def wait_for_ingestion(self, kb_id: str, ds_id: str, job_id: str, max_wait_seconds=600) -> Dict:
+    def wait_for_ingestion(self, kb_id: str, ds_id: str, job_id: str, max_wait_seconds=600,
+                           max_poll_interval=None, initial_poll_interval=None) -> Dict:
         """
         Wait for ingestion job to complete
         
+        The job is polled with exponential backoff and jitter, so short jobs are
+        detected quickly while long jobs are checked sparsely. The backoff restarts
+        whenever the job status changes, so transitions are followed closely.
+        
         Args:
             kb_id: Knowledge base ID
             ds_id: Data source ID
             job_id: Ingestion job ID
             max_wait_seconds: Maximum wait time in seconds
+            max_poll_interval: Maximum delay between status checks in seconds
+                               (defaults to DEFAULT_MAX_POLL_INTERVAL)
+            initial_poll_interval: Delay before the first re-check in seconds, doubled on
+                                   each unchanged poll (defaults to DEFAULT_INITIAL_POLL_INTERVAL)
             
         Returns:
             Final job status
         """
-        start_time = time.time()
+        max_poll_interval = max_poll_interval or DEFAULT_MAX_POLL_INTERVAL
+        initial_poll_interval = initial_poll_interval or DEFAULT_INITIAL_POLL_INTERVAL
+        start_time = time.monotonic()
         previous_status = None
+        previous_counts = None
+        attempt = 0
         
         while True:
             job_info = self.get_ingestion_job_status(kb_id, ds_id, job_id)
             status = job_info.get("status")
             
             if not status:
-                print("Error: Could not retrieve job status")
+                logger.error("Error: Could not retrieve job status")
                 return {"status": "ERROR"}
             
             # Only print if status changed
             if status != previous_status:
-                elapsed_time = time.time() - start_time
-                print(f"[{int(elapsed_time)}s] Ingestion status: {status}")
+                elapsed_time = time.monotonic() - start_time
+                logger.info("[%ds] Ingestion status: %s", elapsed_time, status,
+                            extra={"event": "ingest_status",
+                                   "data": {"job_id": job_id, "elapsed_s": round(elapsed_time, 1), "status": status}})
                 previous_status = status
+                attempt = 0
             
-            # Print statistics if available
-            if "statistics" in job_info:
-                stats = job_info["statistics"]
-                processed = stats.get("numberOfDocumentsProcessed", 0)
-                failed = stats.get("numberOfDocumentsFailed", 0)
-                pending = stats.get("numberOfDocumentsPending", 0)
-                
-                print(f"  Documents: {processed} processed, {failed} failed, {pending} pending")
+            # Print statistics if available and they moved since the last poll
+            stats = job_info.get("statistics")
+            if stats:
+                counts = tuple(stats.get(field, 0) for field in _INGESTION_STAT_FIELDS)
+                if counts != previous_counts:
+                    logger.info("  Documents: %d scanned, %d new indexed, %d modified indexed, "
+                                "%d deleted, %d failed", *counts,
+                                extra={"event": "ingest_stats", "data": {"job_id": job_id, "stats": stats}})
+                    previous_counts = counts
             
             # Check if finished
             if status in ["COMPLETE", "FAILED", "STOPPED"]:
                 if status == "COMPLETE":
-                    print("\n✅ Ingestion job completed successfully!")
+                    logger.info("✅ Ingestion job completed successfully!")
                 elif status == "FAILED":
-                    print("\n❌ Ingestion job failed!")
+                    logger.error("❌ Ingestion job failed!")
                     if "failureReasons" in job_info:
-                        print("Failure reasons:")
+                        logger.error("Failure reasons:")
                         for reason in job_info["failureReasons"]:
-                            print(f"  - {reason}")
+                            logger.error("  - %s", reason)
                 else:
-                    print("\n⚠️ Ingestion job was stopped.")
+                    logger.warning("⚠️ Ingestion job was stopped.")
                 
                 return job_info
             
             # Check timeout
-            if (time.time() - start_time) > max_wait_seconds:
-                print(f"\n⚠️ Reached maximum wait time of {max_wait_seconds} seconds")
-                print("Ingestion job is still running in the background")
+            if (time.monotonic() - start_time) > max_wait_seconds:
+                logger.warning("⚠️ Reached maximum wait time of %s seconds", max_wait_seconds)
+                logger.warning("Ingestion job is still running in the background")
                 return job_info
             
-            # Wait before checking again
-            time.sleep(10)
+            # Wait before checking again, backing off up to max_poll_interval
+            delay = min(max_poll_interval, initial_poll_interval * 2 ** attempt) + random.uniform(0, 1)
+            attempt += 1
+            time.sleep(delay)
+    
+    def quickingest(self, kb_id: str, s3_bucket: str, s3_prefix: str = "documents/",
+                    wait: bool = False, name: str = None) -> Dict:
+        """
+        Add an S3 data source to a knowledge base and start ingesting it
+        
+        Args:
+            kb_id: Knowledge base ID
+            s3_bucket: S3 bucket name
+            s3_prefix: S3 prefix/folder
+            wait: Whether to wait for the ingestion job to finish
+            name: Data source name (defaults to a timestamped name)
+            
+        Returns:
+            Dictionary with the data source ID, job ID and (if waited for) final job status
+        """
+        # Generate a unique data source name
+        ds_name = name or f"s3-source-{int(time.time())}"
+        
+        ds_id = self.add_s3_data_source(
+            kb_id=kb_id,
+            name=ds_name,
+            s3_bucket=s3_bucket,
+            s3_prefix=s3_prefix
+        )
+        logger.info("Created data source with ID: %s", ds_id)
+        
+        job_id = self.start_ingestion(kb_id, ds_id)
+        logger.info("Started ingestion job: %s", job_id)
+        
+        result = {"dataSourceId": ds_id, "ingestionJobId": job_id}
+        if wait:
+            result["job"] = self.wait_for_ingestion(kb_id, ds_id, job_id)
+        return result
+    
+    async def quickingest_async(self, kb_id: str, s3_bucket: str, s3_prefix: str = "documents/",
+                                wait: bool = False) -> Dict:
+        """
+        Non-blocking version of quickingest for use inside an event loop
+        
+        The boto3 calls run in a worker thread (clients are thread-safe), so
+        the event loop keeps serving other tasks while AWS responds.
+        
+        Args:
+            kb_id: Knowledge base ID
+            s3_bucket: S3 bucket name
+            s3_prefix: S3 prefix/folder
+            wait: Whether to wait for the ingestion job to finish
+            
+        Returns:
+            Same dictionary as quickingest
+        """
+        return await asyncio.to_thread(self.quickingest, kb_id, s3_bucket, s3_prefix, wait)
+    
+    def quickingest_many(self, kb_id: str, sources: List[Dict], wait: bool = False,
+                         max_concurrency: int = DEFAULT_INGEST_CONCURRENCY) -> List[Dict]:
+        """
+        Quick ingest several S3 locations into knowledge bases concurrently
+        
+        Args:
+            kb_id: Knowledge base ID (used for sources that don't name their own)
+            sources: List of dictionaries with 's3_bucket' and optional 's3_prefix' and 'kb_id'
+            wait: Whether to wait for all ingestion jobs to finish
+            max_concurrency: Maximum number of data sources processed at once
+            
+        Returns:
+            List of quickingest results in the order of sources; a source that
+            failed has an 'error' entry instead
+        """
+        # One timestamp for the batch, made unique per source by its position
+        batch_name = f"s3-source-{int(time.time())}"
+        
+        def ingest_one(index_source):
+            index, source = index_source
+            try:
+                return self.quickingest(source.get('kb_id', kb_id), source['s3_bucket'],
+                                        source.get('s3_prefix', "documents/"),
+                                        wait=wait, name=f"{batch_name}-{index}")
+            except Exception as e:
+                return {"error": str(e)}
+        
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            return list(executor.map(ingest_one, enumerate(sources)))
     
     def _create_vector_collection(self, collection_name: str) -> str:
         """
@@ -306,15 +634,16 @@ class KnowledgeBaseIngestor:
         Returns:
             Collection ARN
         """
-        opensearch = boto3.client('opensearchserverless', region_name=self.region)
+        from botocore.exceptions import WaiterError
+        from botocore.waiter import WaiterModel, create_waiter_with_client
+        
+        opensearch = self.opensearch
         
         try:
-            # Check if collection already exists
-            try:
-                existing = opensearch.describe_collection(id=collection_name)
-                return existing['collectionDetail']['arn']
-            except:
-                pass  # Collection doesn't exist, create it
+            # Check if collection already exists (unknown names come back empty, not as an error)
+            existing = opensearch.batch_get_collection(names=[collection_name]).get('collectionDetails')
+            if existing:
+                return existing[0]['arn']
                 
             response = opensearch.create_collection(
                 name=collection_name,
@@ -324,28 +653,36 @@ class KnowledgeBaseIngestor:
             
             collection_arn = response['createCollectionDetail']['arn']
             
-            print("Waiting for OpenSearch Serverless collection to be active...")
-            waiter_time = 0
-            while True:
-                status = opensearch.describe_collection(id=collection_name)
-                current_status = status['collectionDetail']['status']
-                print(f"Collection status: {current_status} (waited {waiter_time}s)")
-                
-                if current_status == 'ACTIVE':
-                    break
-                    
-                time.sleep(30)
-                waiter_time += 30
-                
-                # Timeout after 20 minutes
-                if waiter_time > 1200:  # 20 minutes in seconds
-                    print("Warning: Timed out waiting for collection to be active")
+            # The create response already carries the first status observation
+            if response['createCollectionDetail'].get('status') == 'ACTIVE':
+                return collection_arn
+            
+            logger.info("Waiting for OpenSearch Serverless collection to be active...")
+            waiter_config = _COLLECTION_WAITER_CONFIG["waiters"]["CollectionActive"]
+            for delay, max_attempts in _COLLECTION_WAIT_STAGES:
+                model = WaiterModel({
+                    "version": 2,
+                    "waiters": {"CollectionActive": dict(waiter_config, delay=delay, maxAttempts=max_attempts)}
+                })
+                waiter = create_waiter_with_client("CollectionActive", model, opensearch)
+                # A waiter checks immediately, which would repeat the create response or
+                # the previous stage's last check, so wait one interval first
+                time.sleep(delay)
+                try:
+                    waiter.wait(names=[collection_name])
                     break
+                except WaiterError as e:
+                    # A FAILED collection or an API error (access denied, throttling) also raises
+                    # WaiterError; only running out of attempts moves on to the next stage
+                    if not e.kwargs.get("reason", "").startswith("Max attempts exceeded"):
+                        raise
+            else:
+                logger.warning("Warning: Timed out waiting for collection to be active")
             
             return collection_arn
             
         except Exception as e:
-            print(f"Error creating vector collection: {str(e)}")
+            logger.error("Error creating vector collection: %s", e)
             raise
     
     def _get_or_create_kb_role(self) -> str:
@@ -355,54 +692,168 @@ class KnowledgeBaseIngestor:
         Returns:
             IAM role ARN
         """
-        iam = boto3.client('iam')
+        from botocore.exceptions import ClientError
+        
+        iam = self.iam
         role_name = "AmazonBedrockExecutionRoleForKnowledgeBase"
         
         try:
-            response = iam.get_role(RoleName=role_name)
-            return response['Role']['Arn']
-        except:
-            # Create role if doesn't exist
-            trust_policy = {
-                "Version": "2012-10-17",
-                "Statement": [
-                    {
-                        "Effect": "Allow",
-                        "Principal": {
-                            "Service": "bedrock.amazonaws.com"
-                        },
-                        "Action": "sts:AssumeRole"
-                    }
-                ]
-            }
-            
-            role_response = iam.create_role(
-                RoleName=role_name,
-                AssumeRolePolicyDocument=json.dumps(trust_policy),
-                Description="Execution role for Amazon Bedrock Knowledge Base"
-            )
-            
-            # Attach necessary policies
-            iam.attach_role_policy(
-                RoleName=role_name,
-                PolicyArn='arn:aws:iam::aws:policy/AmazonBedrockFullAccess'
-            )
-            
-            # Also attach S3 read access
-            iam.attach_role_policy(
-                RoleName=role_name,
-                PolicyArn='arn:aws:iam::aws:policy/AmazonS3ReadOnlyAccess'
-            )
-            
-            return role_response['Role']['Arn']
+            role = iam.get_role(RoleName=role_name).get('Role')
+            if role:
+                return role['Arn']
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchEntity':
+                raise
+        
+        # Create role if doesn't exist
+        role_response = iam.create_role(
+            RoleName=role_name,
+            AssumeRolePolicyDocument=_KB_TRUST_POLICY_JSON,
+            Description="Execution role for Amazon Bedrock Knowledge Base"
+        )
+        
+        # Attach necessary policies (independent calls, so issue them together)
+        with ThreadPoolExecutor(max_workers=len(_KB_ROLE_POLICY_ARNS)) as executor:
+            list(executor.map(
+                lambda policy_arn: iam.attach_role_policy(RoleName=role_name, PolicyArn=policy_arn),
+                _KB_ROLE_POLICY_ARNS
+            ))
+        
+        return role_response['Role']['Arn']
+
+
+def _cmd_create(args, ingestor):
+    """Create a knowledge base"""
+    kb_id = ingestor.create_knowledge_base(
+        kb_name=args.name,
+        s3_bucket=args.bucket,
+        s3_prefix=args.prefix
+    )
+    logger.info("Knowledge Base created: %s", kb_id,
+                extra={"event": "kb_created", "data": {"kb_id": kb_id}})
+    logger.info("Add this to your .env file:")
+    logger.info("AWS_KNOWLEDGE_BASE_ID=%s", kb_id)
+
+
+def _cmd_list(args, ingestor):
+    """List knowledge bases"""
+    kbs = ingestor.list_knowledge_bases()
+    logger.info("Found %d knowledge bases:", len(kbs))
+    for kb in kbs:
+        logger.info("ID: %s - Name: %s - Status: %s", kb['knowledgeBaseId'], kb['name'], kb['status'],
+                    extra={"event": "kb", "data": {"kb_id": kb['knowledgeBaseId'], "name": kb['name'],
+                                                   "status": kb['status']}})
+
+
+def _cmd_add_source(args, ingestor):
+    """Add an S3 data source"""
+    ds_id = ingestor.add_s3_data_source(
+        kb_id=args.kb_id,
+        name=args.name,
+        s3_bucket=args.bucket,
+        s3_prefix=args.prefix
+    )
+    logger.info("Created data source with ID: %s", ds_id,
+                extra={"event": "data_source_created", "data": {"kb_id": args.kb_id, "ds_id": ds_id}})
+    logger.info("To start ingestion, run:")
+    logger.info("python kb_ingestion.py ingest --kb-id %s --ds-id %s", args.kb_id, ds_id)
+
+
+def _cmd_ingest(args, ingestor):
+    """Start an ingestion job"""
+    job_id = ingestor.start_ingestion(args.kb_id, args.ds_id)
+    logger.info("Started ingestion job: %s", job_id,
+                extra={"event": "ingest_started",
+                       "data": {"kb_id": args.kb_id, "ds_id": args.ds_id, "job_id": job_id}})
+    
+    if args.wait:
+        ingestor.wait_for_ingestion(args.kb_id, args.ds_id, job_id)
+    else:
+        logger.info("To monitor progress, run:")
+        logger.info("python kb_ingestion.py monitor --kb-id %s --ds-id %s --job-id %s",
+                    args.kb_id, args.ds_id, job_id)
+
+
+def _cmd_monitor(args, ingestor):
+    """Monitor an ingestion job"""
+    ingestor.wait_for_ingestion(args.kb_id, args.ds_id, args.job_id, args.timeout)
+
+
+def _cmd_quickingest(args, ingestor):
+    """Add data sources for one or more prefixes and ingest them"""
+    logger.info("Quick ingest from S3 bucket %s (%s) into KB %s", args.bucket, ", ".join(args.prefix), args.kb_id)
+    
+    sources = [{"s3_bucket": args.bucket, "s3_prefix": prefix} for prefix in args.prefix]
+    results = ingestor.quickingest_many(args.kb_id, sources, wait=args.wait)
+    
+    for prefix, result in zip(args.prefix, results):
+        if "error" in result:
+            logger.error("Failed to ingest %s: %s", prefix, result['error'],
+                         extra={"event": "ingest_failed",
+                                "data": {"kb_id": args.kb_id, "s3_prefix": prefix, "error": result['error']}})
+            continue
+        logger.info("Started ingestion of %s: data source %s, job %s",
+                    prefix, result['dataSourceId'], result['ingestionJobId'],
+                    extra={"event": "ingest_started",
+                           "data": {"kb_id": args.kb_id, "s3_prefix": prefix,
+                                    "ds_id": result['dataSourceId'], "job_id": result['ingestionJobId']}})
+        if not args.wait:
+            logger.info("To monitor progress of %s, run:", prefix)
+            logger.info("python kb_ingestion.py monitor --kb-id %s --ds-id %s --job-id %s",
+                        args.kb_id, result['dataSourceId'], result['ingestionJobId'])
+
+
+def _cmd_bulk_ingest(args, ingestor):
+    """Ingest every entry of a JSON manifest"""
+    try:
+        with open(args.manifest, "r") as f:
+            entries = json.load(f)
+    except (OSError, ValueError) as e:
+        args.parser.error(f"cannot read manifest {args.manifest}: {e}")
+    
+    # Check every entry before starting any ingestion, so a bad manifest starts nothing
+    if not isinstance(entries, list):
+        args.parser.error(f"manifest {args.manifest} must contain a JSON list of entries")
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            args.parser.error(f"manifest entry {index} must be a JSON object")
+        for key in ("kb_id", "bucket"):
+            if not entry.get(key):
+                args.parser.error(f"manifest entry {index} is missing '{key}'")
+    
+    sources = [
+        {"kb_id": entry["kb_id"], "s3_bucket": entry["bucket"], "s3_prefix": entry.get("prefix", "documents/")}
+        for entry in entries
+    ]
+    logger.info("Bulk ingest of %d sources from %s", len(sources), args.manifest)
+    
+    results = ingestor.quickingest_many(None, sources, wait=args.wait, max_concurrency=args.concurrency)
+    
+    failed = 0
+    for source, result in zip(sources, results):
+        location = f"{source['s3_bucket']}/{source['s3_prefix']}"
+        if "error" in result:
+            failed += 1
+            logger.error("Failed to ingest %s into KB %s: %s", location, source['kb_id'], result['error'],
+                         extra={"event": "ingest_failed",
+                                "data": {"kb_id": source['kb_id'], "s3_bucket": source['s3_bucket'],
+                                         "s3_prefix": source['s3_prefix'], "error": result['error']}})
+        else:
+            logger.info("KB %s: %s -> data source %s, job %s",
+                        source['kb_id'], location, result['dataSourceId'], result['ingestionJobId'],
+                        extra={"event": "ingest_started",
+                               "data": {"kb_id": source['kb_id'], "s3_bucket": source['s3_bucket'],
+                                        "s3_prefix": source['s3_prefix'], "ds_id": result['dataSourceId'],
+                                        "job_id": result['ingestionJobId']}})
+    
+    logger.info("Started %d of %d ingestion jobs", len(sources) - failed, len(sources))
 
 
 def main():
     """Command-line interface for KB ingestion"""
-    # Load environment variables
-    load_dotenv()
-    
     import argparse
+    from logging_config import configure_logging
+    from s3_uploader import verify_aws_credentials, setup_aws_credentials
     parser = argparse.ArgumentParser(description="AWS Bedrock Knowledge Base Ingestion")
     subparsers = parser.add_subparsers(dest="command", help="Command to run")
     
@@ -411,9 +862,11 @@ def main():
     create_parser.add_argument("--name", required=True, help="Knowledge base name")
     create_parser.add_argument("--bucket", required=True, help="S3 bucket name")
     create_parser.add_argument("--prefix", default="documents/", help="S3 prefix/folder")
+    create_parser.set_defaults(func=_cmd_create)
     
     # List KBs command
     list_parser = subparsers.add_parser("list", help="List knowledge bases")
+    list_parser.set_defaults(func=_cmd_list)
     
     # Add data source command
     datasource_parser = subparsers.add_parser("add-source", help="Add S3 data source")
@@ -421,12 +874,14 @@ def main():
     datasource_parser.add_argument("--name", required=True, help="Data source name")
     datasource_parser.add_argument("--bucket", required=True, help="S3 bucket name")
     datasource_parser.add_argument("--prefix", default="documents/", help="S3 prefix/folder")
+    datasource_parser.set_defaults(func=_cmd_add_source)
     
     # Ingest command
     ingest_parser = subparsers.add_parser("ingest", help="Start ingestion job")
     ingest_parser.add_argument("--kb-id", required=True, help="Knowledge base ID")
     ingest_parser.add_argument("--ds-id", required=True, help="Data source ID")
     ingest_parser.add_argument("--wait", action="store_true", help="Wait for ingestion to complete")
+    ingest_parser.set_defaults(func=_cmd_ingest)
     
     # Monitor ingestion command
     monitor_parser = subparsers.add_parser("monitor", help="Monitor ingestion job")
@@ -434,18 +889,33 @@ def main():
     monitor_parser.add_argument("--ds-id", required=True, help="Data source ID")
     monitor_parser.add_argument("--job-id", required=True, help="Ingestion job ID")
     monitor_parser.add_argument("--timeout", type=int, default=600, help="Maximum wait time in seconds")
+    monitor_parser.set_defaults(func=_cmd_monitor)
     
     # Quick ingest command (all in one)
     quickingest_parser = subparsers.add_parser("quickingest", help="Quick ingest from S3")
     quickingest_parser.add_argument("--kb-id", required=True, help="Knowledge base ID")
     quickingest_parser.add_argument("--bucket", required=True, help="S3 bucket name")
-    quickingest_parser.add_argument("--prefix", default="documents/", help="S3 prefix/folder")
+    quickingest_parser.add_argument("--prefix", nargs="+", default=["documents/"],
+                                    help="S3 prefix/folder (several are ingested as separate data sources in parallel)")
     quickingest_parser.add_argument("--wait", action="store_true", help="Wait for ingestion to complete")
+    quickingest_parser.set_defaults(func=_cmd_quickingest)
+    
+    # Bulk ingest command (many sources from a manifest)
+    bulk_parser = subparsers.add_parser("bulk-ingest", help="Ingest many S3 sources listed in a manifest")
+    bulk_parser.add_argument("--manifest", required=True,
+                             help='JSON file with a list of {"kb_id": ..., "bucket": ..., "prefix": ...} entries')
+    bulk_parser.add_argument("--concurrency", type=int, default=DEFAULT_INGEST_CONCURRENCY,
+                             help="Maximum number of sources ingested at once")
+    bulk_parser.add_argument("--wait", action="store_true", help="Wait for all ingestion jobs to complete")
+    bulk_parser.set_defaults(func=_cmd_bulk_ingest, parser=bulk_parser)
     
     # Global arguments
-    parser.add_argument("--region", default=os.environ.get("AWS_REGION", "us-east-1"), help="AWS region")
+    parser.add_argument("--region", default=_DEFAULT_REGION, help="AWS region")
+    parser.add_argument("--verbose", action="store_true", help="Show debug output")
+    parser.add_argument("--json-logs", action="store_true", help="Write log output to stderr as one JSON object per line")
     
     args = parser.parse_args()
+    configure_logging(args.verbose, args.json_logs)
     
     # Check if command specified
     if not args.command:
@@ -458,80 +928,14 @@ def main():
         setup = input("Would you like to set up AWS credentials now? (y/n): ")
         if setup.lower() == 'y':
             if not setup_aws_credentials():
-                print("Failed to set up AWS credentials. Exiting.")
+                logger.error("Failed to set up AWS credentials. Exiting.")
                 return
         else:
             return
     
-    # Create ingestor object
+    # Create ingestor object and run the command
     ingestor = KnowledgeBaseIngestor(args.region)
-    
-    # Process commands
-    if args.command == "create":
-        kb_id = ingestor.create_knowledge_base(
-            kb_name=args.name,
-            s3_bucket=args.bucket,
-            s3_prefix=args.prefix
-        )
-        print(f"\nKnowledge Base created: {kb_id}")
-        print("Add this to your .env file:")
-        print(f"AWS_KNOWLEDGE_BASE_ID={kb_id}")
-        
-    elif args.command == "list":
-        kbs = ingestor.list_knowledge_bases()
-        print(f"Found {len(kbs)} knowledge bases:")
-        for kb in kbs:
-            print(f"ID: {kb['knowledgeBaseId']} - Name: {kb['name']} - Status: {kb['status']}")
-            
-    elif args.command == "add-source":
-        ds_id = ingestor.add_s3_data_source(
-            kb_id=args.kb_id,
-            name=args.name,
-            s3_bucket=args.bucket,
-            s3_prefix=args.prefix
-        )
-        print(f"Created data source with ID: {ds_id}")
-        print(f"To start ingestion, run:")
-        print(f"python kb_ingestion.py ingest --kb-id {args.kb_id} --ds-id {ds_id}")
-        
-    elif args.command == "ingest":
-        job_id = ingestor.start_ingestion(args.kb_id, args.ds_id)
-        print(f"Started ingestion job: {job_id}")
-        
-        if args.wait:
-            ingestor.wait_for_ingestion(args.kb_id, args.ds_id, job_id)
-        else:
-            print(f"To monitor progress, run:")
-            print(f"python kb_ingestion.py monitor --kb-id {args.kb_id} --ds-id {args.ds_id} --job-id {job_id}")
-            
-    elif args.command == "monitor":
-        ingestor.wait_for_ingestion(args.kb_id, args.ds_id, args.job_id, args.timeout)
-        
-    elif args.command == "quickingest":
-        print(f"Quick ingest from S3 bucket {args.bucket}/{args.prefix} into KB {args.kb_id}")
-        
-        # Generate a unique data source name
-        ds_name = f"s3-source-{int(time.time())}"
-        
-        # Add data source
-        ds_id = ingestor.add_s3_data_source(
-            kb_id=args.kb_id,
-            name=ds_name,
-            s3_bucket=args.bucket,
-            s3_prefix=args.prefix
-        )
-        print(f"Created data source with ID: {ds_id}")
-        
-        # Start ingestion
-        job_id = ingestor.start_ingestion(args.kb_id, ds_id)
-        print(f"Started ingestion job: {job_id}")
-        
-        # Wait if requested
-        if args.wait:
-            ingestor.wait_for_ingestion(args.kb_id, ds_id, job_id)
-        else:
-            print(f"To monitor progress, run:")
-            print(f"python kb_ingestion.py monitor --kb-id {args.kb_id} --ds-id {ds_id} --job-id {job_id}")
+    args.func(args, ingestor)
 
 
 if __name__ == "__main__":
@@ -4,20 +4,211 @@ Knowledge Base Query Module
 This module provides functions for querying an AWS Bedrock Knowledge Base.
 """
 import boto3
+import copy
+import functools
 import json
+import logging
 import os
-from typing import Dict, List, Any, Optional, Union
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from statistics import fmean
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from typing import Callable, Dict, Iterator, List, Any, Optional, Union
 from dotenv import load_dotenv
 from s3_uploader import verify_aws_credentials, setup_aws_credentials
 
+logger = logging.getLogger(__name__)
+
+# orjson encodes and decodes request/response bodies several times faster when installed
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
 # Load environment variables
 load_dotenv()
 
+# Settings read once after .env is loaded
+_DEFAULT_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+_ALT_MODEL = os.environ.get("AWS_BEDROCK_LLM_MODEL")
+
+# Embedding model used to compare questions for the semantic answer cache
+DEFAULT_EMBEDDING_MODEL = "amazon.titan-embed-text-v2:0"
+
+# Retrieval results kept for repeated identical questions, and for how long (seconds)
+RETRIEVAL_CACHE_SIZE = 1024
+RETRIEVAL_CACHE_TTL = 300
+
+# Retrieve calls issued at once by query_knowledge_base_batch
+DEFAULT_BATCH_WORKERS = 8
+
+# Model used to generate answers unless one is given or set in AWS_BEDROCK_LLM_MODEL
+DEFAULT_LLM_MODEL = "meta.llama3-1-70b-instruct-v1:0"
+
+# Answer prompt, split around the context and question that are filled in per call
+_PROMPT_TEMPLATE = (
+    "You are a helpful assistant that answers questions based only on the provided context. \n"
+    "Be concise and factual. If you don't know the answer or if the information isn't in the context, say so.\n"
+    "\n"
+    "Context:\n",
+    "\n\nQuestion: ",
+    "\n\nAnswer:"
+)
+
+# Generation settings, in the Llama InvokeModel body format and the Converse format
+_LLAMA_PARAMS = {"max_gen_len": 1000, "temperature": 0.1, "top_p": 0.9}
+_CONVERSE_INFERENCE_CONFIG = {"maxTokens": 1000, "temperature": 0.1, "topP": 0.9}
+
+# Shared by every client: keep-alive connections and client-side backoff when throttled
+_CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True
+)
+
+# Consecutive throttled calls that open a querier's circuit breaker, and seconds it stays open
+BREAKER_FAIL_MAX = 5
+BREAKER_RESET_TIMEOUT = 30
+
+# Error codes Bedrock returns when a caller is over its request or token rate
+_THROTTLING_CODES = frozenset({
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceQuotaExceededException'
+})
+
+# Clients reused across querier instances, keyed by (session, service, region, verify_ssl)
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _default_session(region: str):
+    """
+    Get a boto3 session for a region, created once per process
+    
+    Args:
+        region: AWS region
+        
+    Returns:
+        Cached boto3 Session
+    """
+    return boto3.session.Session(region_name=region)
+
+
+def _get_client(session, service: str, region: str, verify_ssl: bool = True):
+    """
+    Get a client for a service, creating it on first use
+    
+    Args:
+        session: boto3 Session to create the client from
+        service: AWS service name
+        region: AWS region
+        verify_ssl: Whether to verify SSL certificates
+        
+    Returns:
+        boto3 client
+    """
+    key = (session, service, region, verify_ssl)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = session.client(service, region_name=region, verify=verify_ssl, config=_CLIENT_CONFIG)
+            _clients[key] = client
+    return client
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling Bedrock while a circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated throttling instead of queueing more calls behind it"""
+    
+    def __init__(self, fail_max: int = BREAKER_FAIL_MAX, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        """
+        Initialize the breaker in the closed state
+        
+        Args:
+            fail_max: Consecutive throttled calls (after the SDK's own retries) that open the breaker
+            reset_timeout: Seconds the breaker stays open before a trial call is let through
+        """
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+    
+    def call(self, fn: Callable, *args, **kwargs):
+        """
+        Call a function through the breaker
+        
+        Args:
+            fn: Function making the AWS call
+            *args, **kwargs: Passed to fn
+            
+        Returns:
+            The function's return value
+        
+        Raises:
+            CircuitOpenError: If the breaker is open
+        """
+        with self._lock:
+            if self._opened_at is not None:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(
+                        f"Bedrock is throttling requests; not retrying for another {remaining:.0f}s"
+                    )
+                # Half-open: one more throttled call reopens the breaker
+                self._opened_at = None
+                self._failures = self.fail_max - 1
+        
+        try:
+            result = fn(*args, **kwargs)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in _THROTTLING_CODES:
+                with self._lock:
+                    self._failures += 1
+                    if self._failures >= self.fail_max:
+                        self._opened_at = time.monotonic()
+            raise
+        
+        with self._lock:
+            self._failures = 0
+        return result
+
+
+# Errors from a Bedrock call that are reported rather than treated as bugs
+_BEDROCK_ERRORS = (BotoCoreError, ClientError, CircuitOpenError)
+
+
+def _source_file_name(result: Dict) -> str:
+    """
+    Get the file name of a retrieval result's S3 source
+    
+    Args:
+        result: Retrieval result
+        
+    Returns:
+        Last path segment of the source URI, or 'Unknown'
+    """
+    source = result.get('location', {}).get('s3Location', {}).get('uri', 'Unknown')
+    return source.rsplit('/', 1)[-1]
+
 
 class KnowledgeBaseQuerier:
     """Class for querying AWS Bedrock Knowledge Base"""
     
-    def __init__(self, kb_id: str, region=None, verify_ssl=True):
+    def __init__(self, kb_id: str, region=None, verify_ssl=True, session=None, answer_cache=None,
+                 latency_optimized=False):
         """
         Initialize with knowledge base ID
         
@@ -25,18 +216,32 @@ class KnowledgeBaseQuerier:
             kb_id: Knowledge base ID
             region: AWS region
             verify_ssl: Whether to verify SSL certificates (set to False to bypass SSL validation errors)
+            session: Optional boto3 Session to create clients from (shared to avoid
+                     repeated credential and endpoint resolution)
+            answer_cache: Optional SemanticCache consulted by query_with_llm_generation
+                          before retrieving and generating
+            latency_optimized: Whether to request Bedrock's latency-optimized inference
+                               (only some models and regions support it)
         """
         self.kb_id = kb_id
-        self.region = region or os.environ.get('AWS_REGION', 'us-east-1')
+        self.answer_cache = answer_cache
+        self.latency_optimized = latency_optimized
+        
+        # Exact-match cache of retrieval results: (question, max_results) -> (expires, result)
+        self._retrieval_cache = OrderedDict()
+        self._cache_lock = threading.RLock()
+        self.region = region or _DEFAULT_REGION
         
-        # Create session with optional SSL verification
-        session = boto3.Session(region_name=self.region)
-        self.bedrock_agent_runtime = session.client('bedrock-agent-runtime', 
-                                                   region_name=self.region, 
-                                                   verify=verify_ssl)
-        self.bedrock_runtime = session.client('bedrock-runtime', 
-                                             region_name=self.region, 
-                                             verify=verify_ssl)
+        self.verify_ssl = verify_ssl
+        self._model_arn_prefix = f"arn:aws:bedrock:{self.region}::foundation-model/"
+        
+        # Get clients with optional SSL verification
+        self.session = session or _default_session(self.region)
+        self.bedrock_agent_runtime = _get_client(self.session, 'bedrock-agent-runtime', self.region, verify_ssl)
+        self.bedrock_runtime = _get_client(self.session, 'bedrock-runtime', self.region, verify_ssl)
+        
+        # Shared by every Bedrock call this querier makes, so throttling on one stops the others too
+        self._breaker = CircuitBreaker()
     
     def query_knowledge_base(self, question: str, max_results: int = 5) -> Dict[str, Any]:
         """
@@ -49,9 +254,17 @@ class KnowledgeBaseQuerier:
         Returns:
             Dictionary with question and retrieval results
         """
+        key = (question, max_results)
+        with self._cache_lock:
+            cached = self._retrieval_cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self._retrieval_cache.move_to_end(key)
+                # Callers get their own copy, so mutating a result can't change later hits
+                return copy.deepcopy(cached[1])
         
         try:
-            response = self.bedrock_agent_runtime.retrieve(
+            response = self._breaker.call(
+                self.bedrock_agent_runtime.retrieve,
                 knowledgeBaseId=self.kb_id,
                 retrievalQuery={
                     'text': question
@@ -63,31 +276,112 @@ class KnowledgeBaseQuerier:
                 }
             )
             
-            return {
+            result = {
                 'question': question,
                 'results': response['retrievalResults']
             }
             
-        except Exception as e:
-            print(f"Error querying knowledge base: {str(e)}")
+        except _BEDROCK_ERRORS as e:
+            logger.error("Error querying knowledge base: %s", e)
             raise
+        
+        with self._cache_lock:
+            self._retrieval_cache[key] = (time.monotonic() + RETRIEVAL_CACHE_TTL, copy.deepcopy(result))
+            self._retrieval_cache.move_to_end(key)
+            if len(self._retrieval_cache) > RETRIEVAL_CACHE_SIZE:
+                self._retrieval_cache.popitem(last=False)
+        
+        return result
+    
+    def query_knowledge_base_batch(self,
+                                   questions: List[str],
+                                   max_results: int = 5,
+                                   max_workers: int = DEFAULT_BATCH_WORKERS,
+                                   return_exceptions: bool = False) -> List[Any]:
+        """
+        Query the knowledge base for several questions concurrently
+        
+        Retrieve takes one query per call, so the questions are sent in parallel
+        and the batch costs roughly one round trip instead of one per question.
+        
+        Args:
+            questions: User questions
+            max_results: Maximum number of documents to retrieve per question
+            max_workers: Maximum number of concurrent Retrieve calls
+            return_exceptions: Return a failed question's exception in its place
+                               instead of raising it
+            
+        Returns:
+            List of query_knowledge_base results in the order of questions
+        """
+        def query_one(question):
+            try:
+                return self.query_knowledge_base(question, max_results)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(questions)))) as executor:
+            return list(executor.map(query_one, questions))
+    
+    def clear_cache(self):
+        """Forget cached retrieval results (e.g. after new documents were ingested)"""
+        with self._cache_lock:
+            self._retrieval_cache.clear()
     
     def query_with_llm_generation(self, 
                               question: str, 
                               max_results: int = 3, 
-                              model_id: str = None) -> Dict[str, Any]:
+                              model_id: str = None,
+                              on_token: Callable[[str], None] = None) -> Dict[str, Any]:
         """
         Query KB and generate response using Llama3.2 70B
         
+        If an answer cache is set, an answer to a similar question for the same
+        knowledge base, model and max_results is returned without calling
+        Bedrock, marked with 'from_cache': True. If the cache cannot be used,
+        the answer is generated as if it were a miss.
+        
         Args:
             question: User question
             max_results: Maximum number of documents to retrieve
             model_id: Model ID to use (defaults to Meta Llama3.2 70B)
+            on_token: Optional callback receiving the answer text as it is generated
+                      (not called when the answer comes from the cache)
             
         Returns:
             Dictionary with question, answer, sources, and confidence
         """
+        if self.answer_cache is None:
+            return self._query_with_llm_generation(question, max_results, model_id, on_token)
         
+        # Answers are only interchangeable for the same knowledge base, model and number of documents
+        context = f"{self.kb_id}|{self._resolve_model_id(model_id)}|{max_results}"
+        result, cache_hit = self.answer_cache.get_or_compute(
+            question,
+            lambda: self._query_with_llm_generation(question, max_results, model_id, on_token),
+            context=context,
+            should_store=is_cacheable_answer
+        )
+        if cache_hit:
+            result['from_cache'] = True
+        return result
+    
+    def _query_with_llm_generation(self, question: str, max_results: int, model_id: str,
+                                   on_token: Callable[[str], None] = None) -> Dict[str, Any]:
+        """
+        Retrieve documents and generate an answer, without consulting the answer cache
+        
+        Args:
+            question: User question
+            max_results: Maximum number of documents to retrieve
+            model_id: Model ID to use
+            on_token: Optional callback receiving the answer text as it is generated
+            
+        Returns:
+            Dictionary with question, answer, sources, and confidence
+        """
         # First, retrieve relevant documents
         kb_results = self.query_knowledge_base(question, max_results)
         
@@ -104,7 +398,7 @@ class KnowledgeBaseQuerier:
         context = self._prepare_context(kb_results['results'])
         
         # Generate response using LLM
-        llm_response = self._generate_with_llm(question, context, model_id)
+        llm_response = self._generate_with_llm(question, context, model_id, on_token)
         
         # Calculate confidence
         confidence = self._calculate_confidence(kb_results['results'])
@@ -116,6 +410,73 @@ class KnowledgeBaseQuerier:
             'confidence_score': confidence
         }
     
+    def query_rag_single_call(self,
+                              question: str,
+                              max_results: int = 3,
+                              model_id: str = None) -> Dict[str, Any]:
+        """
+        Query KB and generate a response with a single RetrieveAndGenerate call
+        
+        Retrieval and generation both happen inside Bedrock, saving the round trip
+        between them. Bedrock builds the prompt itself, so use
+        query_with_llm_generation when the local prompt template matters.
+        
+        Args:
+            question: User question
+            max_results: Maximum number of documents to retrieve
+            model_id: Model ID or ARN to use (defaults as in query_with_llm_generation)
+            
+        Returns:
+            Dictionary with question, answer, sources, and confidence (the
+            cited references carry no relevance scores, so confidence is 0.0)
+        """
+        model_id = self._resolve_model_id(model_id)
+        model_arn = model_id if model_id.startswith("arn:") else self._model_arn_prefix + model_id
+        
+        try:
+            response = self._breaker.call(
+                self.bedrock_agent_runtime.retrieve_and_generate,
+                input={'text': question},
+                retrieveAndGenerateConfiguration={
+                    'type': 'KNOWLEDGE_BASE',
+                    'knowledgeBaseConfiguration': {
+                        'knowledgeBaseId': self.kb_id,
+                        'modelArn': model_arn,
+                        'retrievalConfiguration': {
+                            'vectorSearchConfiguration': {
+                                'numberOfResults': max_results
+                            }
+                        },
+                        'generationConfiguration': {
+                            'inferenceConfig': {
+                                'textInferenceConfig': {
+                                    'maxTokens': 1000,
+                                    'temperature': 0.1,
+                                    'topP': 0.9
+                                }
+                            }
+                        }
+                    }
+                }
+            )
+        except _BEDROCK_ERRORS as e:
+            logger.error("Error querying knowledge base: %s", e)
+            raise
+        
+        # Each citation covers part of the answer; flatten the documents they reference
+        sources = [
+            reference
+            for citation in response.get('citations', [])
+            for reference in citation.get('retrievedReferences', [])
+        ]
+        
+        return {
+            'question': question,
+            'generated_answer': response['output']['text'].strip(),
+            'source_documents': sources,
+            'confidence_score': self._calculate_confidence(sources)
+        }
+    
     def _prepare_context(self, retrieval_results: List[Dict]) -> str:
         """
         Prepare context from retrieved documents
@@ -126,18 +487,13 @@ class KnowledgeBaseQuerier:
         Returns:
             Formatted context string
         """
-        context_parts = []
-        
-        for i, result in enumerate(retrieval_results, 1):
-            content = result['content']['text']
-            source = result.get('location', {}).get('s3Location', {}).get('uri', 'Unknown')
-            file_name = source.split('/')[-1] if '/' in source else source
-            
-            context_parts.append(f"Document {i} [Source: {file_name}]\n{content}\n")
-        
-        return "\n".join(context_parts)
+        return "\n".join(
+            f"Document {i} [Source: {_source_file_name(result)}]\n{result['content']['text']}\n"
+            for i, result in enumerate(retrieval_results, 1)
+        )
     
-    def _generate_with_llm(self, question: str, context: str, model_id: str = None) -> str:
+    def _generate_with_llm(self, question: str, context: str, model_id: str = None,
+                           on_token: Callable[[str], None] = None) -> str:
         """
         Generate answer using an LLM model
         
@@ -145,51 +501,115 @@ class KnowledgeBaseQuerier:
             question: User question
             context: Document context
             model_id: Model ID to use (defaults to Meta Llama3.2 70B)
+            on_token: Optional callback receiving the answer text as it is generated;
+                      if given, the response is streamed
             
         Returns:
             Generated answer
         """
+        if on_token is not None:
+            parts = []
+            try:
+                for token in self._generate_with_llm_stream(question, context, model_id):
+                    parts.append(token)
+                    on_token(token)
+            except _BEDROCK_ERRORS as e:
+                logger.error("Error generating with LLM: %s", e)
+                return f"Error generating response: {str(e)}"
+            return "".join(parts).strip()
         
-        prompt = f"""You are a helpful assistant that answers questions based only on the provided context. 
-Be concise and factual. If you don't know the answer or if the information isn't in the context, say so.
-
-Context:
-{context}
-
-Question: {question}
-
-Answer:"""
+        prompt = _PROMPT_TEMPLATE[0] + context + _PROMPT_TEMPLATE[1] + question + _PROMPT_TEMPLATE[2]
         
-        body = {
-            "prompt": prompt,
-            "max_gen_len": 1000,
-            "temperature": 0.1,
-            "top_p": 0.9
-        }
+        body = {"prompt": prompt, **_LLAMA_PARAMS}
         
         try:
-            # Default model ID
-            if not model_id:
-                model_id = "meta.llama3-1-70b-instruct-v1:0"
+            model_id = self._resolve_model_id(model_id)
             
-            # Check if alternate model ID is specified in environment
-            alt_model = os.environ.get("AWS_BEDROCK_LLM_MODEL")
-            if alt_model:
-                model_id = alt_model
+            if self.latency_optimized:
+                # performanceConfig is only accepted by the Converse API
+                response = self._breaker.call(
+                    self.bedrock_runtime.converse,
+                    modelId=model_id,
+                    messages=[{"role": "user", "content": [{"text": prompt}]}],
+                    inferenceConfig=_CONVERSE_INFERENCE_CONFIG,
+                    performanceConfig={"latency": "optimized"}
+                )
+                return response['output']['message']['content'][0]['text'].strip()
             
-            response = self.bedrock_runtime.invoke_model(
+            response = self._breaker.call(
+                self.bedrock_runtime.invoke_model,
                 modelId=model_id,
-                body=json.dumps(body),
+                body=_json_dumps(body),
                 contentType="application/json"
             )
             
-            response_body = json.loads(response['body'].read())
+            response_body = _json_loads(response['body'].read())
             return response_body.get('generation', '').strip()
             
-        except Exception as e:
-            print(f"Error generating with LLM: {str(e)}")
+        except _BEDROCK_ERRORS as e:
+            logger.error("Error generating with LLM: %s", e)
             return f"Error generating response: {str(e)}"
     
+    def _generate_with_llm_stream(self, question: str, context: str, model_id: str = None) -> Iterator[str]:
+        """
+        Generate answer using an LLM model, yielding text as it arrives
+        
+        Args:
+            question: User question
+            context: Document context
+            model_id: Model ID to use (defaults to Meta Llama3.2 70B)
+            
+        Yields:
+            Pieces of the generated answer
+        """
+        prompt = _PROMPT_TEMPLATE[0] + context + _PROMPT_TEMPLATE[1] + question + _PROMPT_TEMPLATE[2]
+        
+        model_id = self._resolve_model_id(model_id)
+        
+        if self.latency_optimized:
+            # performanceConfig is only accepted by the Converse API
+            response = self._breaker.call(
+                self.bedrock_runtime.converse_stream,
+                modelId=model_id,
+                messages=[{"role": "user", "content": [{"text": prompt}]}],
+                inferenceConfig=_CONVERSE_INFERENCE_CONFIG,
+                performanceConfig={"latency": "optimized"}
+            )
+            for event in response['stream']:
+                text = event.get('contentBlockDelta', {}).get('delta', {}).get('text')
+                if text:
+                    yield text
+            return
+        
+        body = {"prompt": prompt, **_LLAMA_PARAMS}
+        
+        response = self._breaker.call(
+            self.bedrock_runtime.invoke_model_with_response_stream,
+            modelId=model_id,
+            body=_json_dumps(body),
+            contentType="application/json"
+        )
+        for event in response['body']:
+            chunk = event.get('chunk')
+            if chunk:
+                text = _json_loads(chunk['bytes']).get('generation')
+                if text:
+                    yield text
+    
+    @staticmethod
+    def _resolve_model_id(model_id: str = None) -> str:
+        """
+        Get the model that will actually generate the answer
+        
+        Args:
+            model_id: Requested model ID
+            
+        Returns:
+            AWS_BEDROCK_LLM_MODEL if set, otherwise model_id or DEFAULT_LLM_MODEL
+        """
+        # An alternate model ID in the environment takes precedence
+        return _ALT_MODEL or model_id or DEFAULT_LLM_MODEL
+    
     def _calculate_confidence(self, results: List[Dict]) -> float:
         """
         Calculate confidence score based on retrieval results
@@ -203,16 +623,32 @@ Answer:"""
         if not results:
             return 0.0
         
-        # Simple confidence calculation based on scores
-        scores = [result.get('score', 0) for result in results]
+        # Simple confidence calculation based on scores, averaged in one pass
+        avg_score = fmean(result.get('score', 0) for result in results)
         
-        if not scores:
-            return 0.0
-            
         # Normalize to 0-1 range
-        avg_score = sum(scores) / len(scores)
         return min(max(avg_score, 0.0), 1.0)
 
+    def embed_text(self, text: str, model_id: str = DEFAULT_EMBEDDING_MODEL) -> List[float]:
+        """
+        Embed text using a Bedrock Titan embedding model
+        
+        Args:
+            text: Text to embed
+            model_id: Embedding model ID
+            
+        Returns:
+            Embedding vector
+        """
+        response = self._breaker.call(
+            self.bedrock_runtime.invoke_model,
+            modelId=model_id,
+            body=_json_dumps({"inputText": text}),
+            contentType="application/json"
+        )
+        response_body = _json_loads(response['body'].read())
+        return response_body['embedding']
+
     def get_available_models(self) -> List[Dict]:
         """
         Get list of available Bedrock models
@@ -221,15 +657,119 @@ Answer:"""
             List of model information
         """
         try:
-            bedrock = boto3.client('bedrock', region_name=self.region)
+            bedrock = _get_client(self.session, 'bedrock', self.region, self.verify_ssl)
             response = bedrock.list_foundation_models()
             return response.get('modelSummaries', [])
-        except Exception as e:
-            print(f"Error getting model list: {str(e)}")
+        except _BEDROCK_ERRORS as e:
+            logger.error("Error getting model list: %s", e)
             return []
 
 
-def interactive_query_mode(kb_id: str, region: str = None, verify_ssl: bool = True):
+class BatchingScheduler:
+    """Coalesce retrieval requests from many callers into concurrent batches"""
+    
+    def __init__(self, querier: KnowledgeBaseQuerier, max_batch: int = 16, max_wait_ms: int = 20):
+        """
+        Initialize and start the batching thread
+        
+        Args:
+            querier: Querier used to run the batches
+            max_batch: Maximum number of questions per batch
+            max_wait_ms: How long to wait for more questions after the first one arrives
+        """
+        self.querier = querier
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="kb-query-batcher", daemon=True)
+        self._thread.start()
+    
+    def submit(self, question: str, max_results: int = 5) -> Future:
+        """
+        Queue a question for retrieval
+        
+        Args:
+            question: User question
+            max_results: Maximum number of documents to retrieve
+            
+        Returns:
+            Future resolving to the query_knowledge_base result
+        """
+        future = Future()
+        self._queue.put((question, max_results, future))
+        return future
+    
+    def close(self):
+        """Finish queued questions and stop the batching thread"""
+        self._queue.put(None)
+        self._thread.join()
+    
+    def _run(self):
+        """Collect questions into batches and run them until closed"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            closing = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            
+            self._run_batch(batch)
+            if closing:
+                return
+    
+    def _run_batch(self, batch):
+        """
+        Run one batch and resolve its futures
+        
+        Args:
+            batch: List of (question, max_results, future) tuples
+        """
+        # Questions asking for a different number of results form separate sub-batches
+        by_max_results = {}
+        for question, max_results, future in batch:
+            by_max_results.setdefault(max_results, []).append((question, future))
+        
+        for max_results, items in by_max_results.items():
+            results = self.querier.query_knowledge_base_batch(
+                [question for question, _ in items], max_results, return_exceptions=True
+            )
+            for (_, future), result in zip(items, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+def is_cacheable_answer(result: Dict[str, Any]) -> bool:
+    """
+    Check whether a generated answer is worth caching
+    
+    Args:
+        result: Result from query_with_llm_generation
+        
+    Returns:
+        True if the answer was grounded in documents and generated without error
+    """
+    answer = result.get("generated_answer", "")
+    return bool(result.get("source_documents")) and bool(answer) and not answer.startswith("Error generating response")
+
+
+def interactive_query_mode(kb_id: str, region: str = None, verify_ssl: bool = True, answer_cache=None,
+                           session=None, model_id: str = None, latency_optimized: bool = False):
     """
     Run interactive query mode
     
@@ -237,8 +777,13 @@ def interactive_query_mode(kb_id: str, region: str = None, verify_ssl: bool = Tr
         kb_id: Knowledge base ID
         region: AWS region
         verify_ssl: Whether to verify SSL certificates
+        answer_cache: Optional SemanticCache used to reuse answers to similar questions
+        session: Optional boto3 Session to create clients from
+        model_id: Optional model ID to use for generation
+        latency_optimized: Whether to request Bedrock's latency-optimized inference
     """
-    querier = KnowledgeBaseQuerier(kb_id, region, verify_ssl)
+    querier = KnowledgeBaseQuerier(kb_id, region, verify_ssl, session=session, answer_cache=answer_cache,
+                                   latency_optimized=latency_optimized)
     
     print(f"\nInteractive Query Mode (Knowledge Base: {kb_id})")
     print("Type your questions and press Enter. Type 'exit' to quit.")
@@ -256,20 +801,36 @@ def interactive_query_mode(kb_id: str, region: str = None, verify_ssl: bool = Tr
             
         try:
             print("Generating answer...")
-            result = querier.query_with_llm_generation(question)
+            streamed = []
             
-            print("\n" + "=" * 80)
-            print("ANSWER:")
-            print("-" * 80)
-            print(result["generated_answer"])
+            def print_token(token):
+                # Print the header before the first piece of the answer
+                if not streamed:
+                    print("\n" + "=" * 80)
+                    print("ANSWER:")
+                    print("-" * 80)
+                    token = token.lstrip()
+                streamed.append(token)
+                print(token, end="", flush=True)
+            
+            result = querier.query_with_llm_generation(question, model_id=model_id, on_token=print_token)
+            
+            if streamed:
+                print()
+            else:
+                if result.get("from_cache"):
+                    print("(answer served from cache)")
+                print("\n" + "=" * 80)
+                print("ANSWER:")
+                print("-" * 80)
+                print(result["generated_answer"])
             print("-" * 80)
             
             # Show sources if available
             if result.get("source_documents"):
                 print("\nSOURCES:")
                 for i, doc in enumerate(result["source_documents"][:3], 1):
-                    source = doc.get("location", {}).get("s3Location", {}).get("uri", "Unknown")
-                    file_name = source.split("/")[-1] if "/" in source else source
+                    file_name = _source_file_name(doc)
                     score = doc.get("score", 0)
                     print(f"{i}. {file_name} (score: {score:.4f})")
                     
@@ -281,10 +842,8 @@ def interactive_query_mode(kb_id: str, region: str = None, verify_ssl: bool = Tr
 
 def main():
     """Command-line interface for KB querying"""
-    # Load environment variables
-    load_dotenv()
-    
     import argparse
+    from logging_config import configure_logging
     parser = argparse.ArgumentParser(description="AWS Bedrock Knowledge Base Query Tool")
     
     # Required arguments
@@ -296,12 +855,17 @@ def main():
     parser.add_argument("--max-results", type=int, default=3, help="Maximum number of results to retrieve")
     parser.add_argument("--interactive", action="store_true", help="Run in interactive query mode")
     parser.add_argument("--model", help="Model ID to use for generation")
+    parser.add_argument("--latency-optimized", action="store_true",
+                        help="Use Bedrock latency-optimized inference (supported models and regions only)")
+    parser.add_argument("--single-call", action="store_true",
+                        help="Retrieve and generate in one Bedrock call (uses Bedrock's prompt instead of ours)")
     parser.add_argument("--no-verify-ssl", action="store_true", help="Disable SSL certificate verification")
     
     # Global arguments
-    parser.add_argument("--region", default=os.environ.get("AWS_REGION", "us-east-1"), help="AWS region")
+    parser.add_argument("--region", default=_DEFAULT_REGION, help="AWS region")
     
     args = parser.parse_args()
+    configure_logging()
     
     # Verify credentials
     verified, _ = verify_aws_credentials(args.region)
@@ -316,11 +880,12 @@ def main():
     
     # Create querier object
     verify_ssl = not args.no_verify_ssl
-    querier = KnowledgeBaseQuerier(args.kb_id, args.region, verify_ssl)
+    querier = KnowledgeBaseQuerier(args.kb_id, args.region, verify_ssl, latency_optimized=args.latency_optimized)
     
     # Handle interactive mode
     if args.interactive:
-        interactive_query_mode(args.kb_id, args.region, verify_ssl)
+        interactive_query_mode(args.kb_id, args.region, verify_ssl, model_id=args.model,
+                               latency_optimized=args.latency_optimized)
         return
     
     # Handle single question
@@ -337,8 +902,7 @@ def main():
             print(f"\nFound {len(result['results'])} relevant documents for: {args.question}")
             
             for i, doc in enumerate(result['results'], 1):
-                source = doc.get('location', {}).get('s3Location', {}).get('uri', 'Unknown')
-                file_name = source.split('/')[-1] if '/' in source else source
+                file_name = _source_file_name(doc)
                 score = doc.get('score', 0)
                 content = doc.get('content', {}).get('text', '')
                 
@@ -349,7 +913,8 @@ def main():
                 
         else:
             # Generate answer with LLM
-            result = querier.query_with_llm_generation(
+            generate = querier.query_rag_single_call if args.single_call else querier.query_with_llm_generation
+            result = generate(
                 args.question, 
                 args.max_results,
                 args.model
@@ -366,8 +931,7 @@ def main():
             if result.get("source_documents"):
                 print("\nSOURCES:")
                 for i, doc in enumerate(result["source_documents"][:3], 1):
-                    source = doc.get("location", {}).get("s3Location", {}).get("uri", "Unknown")
-                    file_name = source.split("/")[-1] if "/" in source else source
+                    file_name = _source_file_name(doc)
                     score = doc.get("score", 0)
                     print(f"{i}. {file_name} (score: {score:.4f})")
             
@@ -0,0 +1,81 @@
+"""
+Logging Configuration
+
+This module sets up console logging for the command-line tools. Records are
+written synchronously to the same stdout the tools print their results to, so
+log lines, printed output and input prompts appear in the order they happen.
+JSON records go to stderr instead, so they never mix with printed text.
+"""
+import json
+import logging
+import sys
+
+# AWS SDK loggers are very chatty at DEBUG level
+_QUIET_LOGGERS = ("boto3", "botocore", "s3transfer", "urllib3")
+
+_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format each record as a single-line JSON object"""
+
+    def format(self, record):
+        """
+        Format a record
+
+        Records logged with extra={"event": ..., "data": {...}} carry the event
+        name and its fields as top-level keys, so consumers don't parse message text.
+
+        Args:
+            record: Log record
+
+        Returns:
+            JSON string
+        """
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage().strip()
+        }
+        event = getattr(record, "event", None)
+        if event:
+            entry["event"] = event
+            entry.update(getattr(record, "data", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(verbose=False, json_logs=False):
+    """
+    Configure root logging once per process
+
+    Args:
+        verbose: Whether to show debug messages (e.g. one line per uploaded file)
+        json_logs: Whether to write one JSON object per line to stderr instead of
+                   plain messages to stdout
+
+    Returns:
+        The console handler
+    """
+    global _handler
+
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG if verbose else logging.INFO)
+
+    if _handler is not None:
+        return _handler
+
+    for name in _QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    if json_logs:
+        _handler = logging.StreamHandler(sys.stderr)
+        _handler.setFormatter(JsonFormatter())
+    else:
+        _handler = logging.StreamHandler(sys.stdout)
+        _handler.setFormatter(logging.Formatter("%(message)s"))
+    root.addHandler(_handler)
+
+    return _handler
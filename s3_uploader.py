@@ -4,29 +4,150 @@ S3 Document Uploader
 This module provides functions for uploading documents to an S3 bucket.
 """
 import boto3
+from boto3.s3.transfer import S3Transfer, TransferConfig
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import functools
+import hashlib
+import json
+import logging
 import os
+import time
 import mimetypes
 from pathlib import Path
 import sys
-from dotenv import load_dotenv
+from dotenv import dotenv_values, load_dotenv, set_key
+
+logger = logging.getLogger(__name__)
+
+MiB = 1024 * 1024
+
+# Files at or above the threshold are split into parts and uploaded concurrently
+DEFAULT_MULTIPART_THRESHOLD = 8 * MiB
+DEFAULT_MULTIPART_CHUNKSIZE = 16 * MiB
+DEFAULT_MAX_CONCURRENCY = 16
+
+# Number of files uploaded in parallel by upload_directory
+DEFAULT_UPLOAD_WORKERS = 64
+
+# upload_directory logs a progress summary every this many completed files
+PROGRESS_INTERVAL = 100
+
+# Number of prefix shards listed in parallel by list_bucket_contents_parallel
+DEFAULT_LIST_WORKERS = 16
+
+# Successful credential checks are reused for this long to skip the STS round trip
+CREDENTIAL_CACHE_PATH = os.path.join(Path.home(), ".cache", "bedrock_kb", "sts.json")
+CREDENTIAL_CACHE_TTL = 10 * 60
+
+
+def make_transfer_config(max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                         multipart_chunksize=DEFAULT_MULTIPART_CHUNKSIZE,
+                         multipart_threshold=DEFAULT_MULTIPART_THRESHOLD):
+    """
+    Build the transfer configuration used for multipart uploads
+    
+    Args:
+        max_concurrency: Maximum number of parts transferred in parallel
+        multipart_chunksize: Size of each uploaded part in bytes
+        multipart_threshold: File size in bytes above which multipart upload is used
+        
+    Returns:
+        TransferConfig instance
+    """
+    return TransferConfig(
+        multipart_threshold=multipart_threshold,
+        multipart_chunksize=multipart_chunksize,
+        max_concurrency=max_concurrency,
+        use_threads=True
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _default_session(region):
+    """
+    Get a boto3 session for a region, created once per process
+    
+    Args:
+        region: AWS region
+        
+    Returns:
+        Cached boto3 Session
+    """
+    return boto3.Session(region_name=region)
+
+
+@functools.lru_cache(maxsize=128)
+def _guess_content_type(suffix):
+    """
+    Guess the content type for a file's extensions
+    
+    Uploads repeat the same few extensions, so each is only looked up once.
+    All suffixes are passed, not just the last, so compound extensions such
+    as ".tar.gz" get the same type as guessing from the full path.
+    
+    Args:
+        suffix: File extensions including the dots (e.g. ".pdf" or ".tar.gz")
+        
+    Returns:
+        Content type, or application/octet-stream if unknown
+    """
+    content_type, _ = mimetypes.guess_type("x" + suffix)
+    return content_type or "application/octet-stream"
+
+
+def _iter_files(root, recursive=True):
+    """
+    Yield the files below a directory using os.scandir
+    
+    Directory entries carry their file type, so most entries need no extra
+    stat call, and nothing is materialized beyond the current directory.
+    
+    Args:
+        root: Directory to walk
+        recursive: Whether to descend into subdirectories
+        
+    Yields:
+        Path of each file
+    """
+    pending = [str(root)]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        pending.append(entry.path)
+                elif entry.is_file():
+                    yield Path(entry.path)
 
 
 class S3Uploader:
-    def __init__(self, bucket_name, prefix="documents/", region="us-east-1"):
+    def __init__(self, bucket_name, prefix="documents/", region="us-east-1", transfer_config=None,
+                 max_workers=DEFAULT_UPLOAD_WORKERS, session=None):
         """Initialize the document uploader with your bucket configuration"""
-        self.s3 = boto3.client("s3", region_name=region)
+        session = session or _default_session(region)
+        self.transfer_config = transfer_config or make_transfer_config()
+        self.max_workers = max_workers
+        
+        # Size the connection pool so parallel file uploads and multipart parts don't queue for sockets
+        pool_size = max_workers + self.transfer_config.max_concurrency
+        self.s3 = session.client("s3", region_name=region, config=Config(max_pool_connections=pool_size))
         self.bucket_name = bucket_name
         self.prefix = prefix
         if not self.prefix.endswith('/'):
             self.prefix += '/'
+        
+        # A single transfer manager is shared by every upload so its thread pool is reused
+        self.transfer = S3Transfer(self.s3, self.transfer_config)
 
-    def upload_file(self, file_path, content_type=None):
+    def upload_file(self, file_path, content_type=None, size=None):
         """
         Upload a single file to S3
         
         Args:
             file_path: Path to the file to upload
             content_type: Content type of the file
+            size: File size in bytes, if already known (saves a stat call)
             
         Returns:
             Tuple of (success, s3_key)
@@ -36,15 +157,13 @@ class S3Uploader:
             
             # If content type not provided, guess it
             if content_type is None:
-                content_type, _ = mimetypes.guess_type(file_path)
-                if content_type is None:
-                    content_type = "application/octet-stream"
+                content_type = _guess_content_type("".join(file_path.suffixes))
             
             # Create the S3 key (path within the bucket)
-            s3_key = f"{self.prefix}{file_path.name}"
+            s3_key = self.key_for(file_path)
             
             # Upload with metadata
-            print(f"Uploading {file_path} to s3://{self.bucket_name}/{s3_key}")
+            logger.debug("Uploading %s to s3://%s/%s", file_path, self.bucket_name, s3_key)
             
             # Extra args for content type
             extra_args = {
@@ -54,82 +173,317 @@ class S3Uploader:
                 }
             }
             
-            self.s3.upload_file(
-                Filename=str(file_path),
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                ExtraArgs=extra_args
-            )
+            # Small files go out as a single PUT from the calling thread; large files
+            # are split into parts by the shared transfer manager
+            if size is None:
+                size = file_path.stat().st_size
+            if size < self.transfer_config.multipart_threshold:
+                with open(file_path, "rb") as body:
+                    self.s3.put_object(
+                        Bucket=self.bucket_name,
+                        Key=s3_key,
+                        Body=body,
+                        **extra_args
+                    )
+            else:
+                self.transfer.upload_file(
+                    str(file_path),
+                    self.bucket_name,
+                    s3_key,
+                    extra_args=extra_args
+                )
             
             return True, s3_key
             
         except Exception as e:
-            print(f"Error uploading {file_path}: {str(e)}")
+            logger.error("Error uploading %s: %s", file_path, e)
             return False, None
 
-    def upload_directory(self, dir_path, recursive=True):
+    def key_for(self, file_path):
+        """
+        Get the S3 key a local file is uploaded to
+        
+        Args:
+            file_path: Path to the local file
+            
+        Returns:
+            S3 key
+        """
+        return f"{self.prefix}{Path(file_path).name}"
+    
+    def list_directory(self, dir_path, recursive=True):
+        """
+        List the files in a directory that upload_directory would upload
+        
+        Args:
+            dir_path: Directory path to walk
+            recursive: Whether to include subdirectories
+            
+        Returns:
+            List of file paths
+        """
+        return list(_iter_files(dir_path, recursive))
+    
+    def upload_directory(self, dir_path, recursive=True, on_uploaded=None):
         """
         Upload all files in a directory to S3
         
         Args:
             dir_path: Directory path to upload
             recursive: Whether to upload subdirectories
+            on_uploaded: Optional callback invoked with each S3 key as soon as its
+                         upload completes (called from the calling thread)
             
         Returns:
             List of uploaded S3 keys
         """
         dir_path = Path(dir_path)
         if not dir_path.is_dir():
-            print(f"Error: {dir_path} is not a directory")
+            logger.error("Error: %s is not a directory", dir_path)
             return []
         
-        uploaded_files = []
+        # Files are submitted for upload as the walk finds them
+        return self.upload_files(_iter_files(dir_path, recursive), on_uploaded=on_uploaded)
+    
+    def upload_files(self, all_files, on_uploaded=None):
+        """
+        Upload a list of files to S3
         
-        # Walk through the directory
-        if recursive:
-            all_files = dir_path.rglob('*')
-        else:
-            all_files = dir_path.glob('*')
+        Files are uploaded concurrently using up to max_workers threads.
+        
+        Args:
+            all_files: Paths of the files to upload
+            on_uploaded: Optional callback invoked with each S3 key as soon as its
+                         upload completes (called from the calling thread)
             
-        # Filter only files (not directories)
-        all_files = [f for f in all_files if f.is_file()]
+        Returns:
+            List of uploaded S3 keys
+        """
+        uploaded_files = []
+        failed_files = []
+        uploaded_bytes = 0
+        start_time = time.monotonic()
+        
+        def upload_sized(file_path):
+            # Stat once in the worker; the size picks the upload method and feeds the progress totals
+            try:
+                size = file_path.stat().st_size
+            except OSError as e:
+                logger.error("Error uploading %s: %s", file_path, e)
+                return False, None, 0
+            return self.upload_file(file_path, size=size) + (size,)
         
-        for file_path in all_files:
-            success, s3_key = self.upload_file(file_path)
-            if success:
-                uploaded_files.append(s3_key)
+        # Uploads are network-latency bound, so keep many requests in flight at once
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(upload_sized, Path(file_path)): Path(file_path) for file_path in all_files}
+            for completed, future in enumerate(as_completed(futures), 1):
+                file_path = futures[future]
+                success, s3_key, size = future.result()
+                if success:
+                    uploaded_files.append(s3_key)
+                    uploaded_bytes += size
+                    if on_uploaded is not None:
+                        on_uploaded(s3_key)
+                else:
+                    failed_files.append(file_path)
                 
-        print(f"\nUploaded {len(uploaded_files)} files to S3")
+                # Report progress periodically rather than once per file
+                if completed % PROGRESS_INTERVAL == 0:
+                    self._log_progress(completed, len(futures), uploaded_bytes, start_time)
+        
+        self._log_progress(len(futures), len(futures), uploaded_bytes, start_time)
+        logger.info("Uploaded %d files to S3", len(uploaded_files))
+        if failed_files:
+            logger.warning("Failed to upload %d files:", len(failed_files))
+            for file_path in failed_files:
+                logger.warning(" - %s", file_path)
         return uploaded_files
     
-    def list_bucket_contents(self):
+    def _log_progress(self, completed, total, uploaded_bytes, start_time):
+        """
+        Log upload progress and throughput
+        
+        Args:
+            completed: Number of files finished so far
+            total: Total number of files
+            uploaded_bytes: Bytes uploaded successfully so far
+            start_time: time.monotonic() value when the upload started
+        """
+        elapsed = max(time.monotonic() - start_time, 1e-6)
+        logger.info("Progress: %d/%d files, %.1f MiB (%.1f MiB/s)",
+                    completed, total, uploaded_bytes / MiB, uploaded_bytes / MiB / elapsed)
+    
+    def list_bucket_contents(self, include_metadata=False):
         """
         List all objects in the bucket with the given prefix
         
+        Args:
+            include_metadata: Return the listing entries (Key, Size, LastModified, ETag)
+                              instead of just the keys
+            
         Returns:
-            List of S3 keys
+            List of S3 keys, or of object entries if include_metadata is set
         """
         try:
-            response = self.s3.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=self.prefix
-            )
+            objects = self._list_all(self.prefix)
+            return objects if include_metadata else [item['Key'] for item in objects]
+                
+        except Exception as e:
+            logger.error("Error listing bucket contents: %s", e)
+            return []
+    
+    def list_bucket_contents_parallel(self, prefix=None, max_workers=DEFAULT_LIST_WORKERS, max_levels=2,
+                                      include_metadata=False):
+        """
+        List all objects under a prefix by sharding the keyspace on "/" and
+        listing each sub-prefix concurrently
+        
+        Args:
+            prefix: Prefix to list (defaults to the uploader prefix)
+            max_workers: Maximum number of concurrent listing requests
+            max_levels: Maximum number of directory levels to descend while
+                        looking for enough sub-prefixes to keep the workers busy
+            include_metadata: Return the listing entries (Key, Size, LastModified, ETag)
+                              instead of just the keys
             
-            if 'Contents' in response:
-                files = [item['Key'] for item in response['Contents']]
-                return files
-            else:
-                return []
+        Returns:
+            List of S3 keys (or object entries) sorted by key
+        """
+        if prefix is None:
+            prefix = self.prefix
+        
+        try:
+            objects = []
+            shards = [prefix]
+            
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Discover sub-prefixes one level at a time until there are enough to shard on
+                for _ in range(max_levels):
+                    sub_prefixes = []
+                    for level_objects, level_prefixes in executor.map(self._list_level, shards):
+                        objects.extend(level_objects)
+                        sub_prefixes.extend(level_prefixes)
+                    shards = sub_prefixes
+                    if not shards or len(shards) >= max_workers:
+                        break
                 
+                # List everything below the discovered prefixes in parallel
+                for shard_objects in executor.map(self._list_all, shards):
+                    objects.extend(shard_objects)
+            
+            objects.sort(key=lambda item: item['Key'])
+            return objects if include_metadata else [item['Key'] for item in objects]
+            
         except Exception as e:
-            print(f"Error listing bucket contents: {str(e)}")
+            logger.error("Error listing bucket contents: %s", e)
             return []
+    
+    def _list_level(self, prefix):
+        """
+        List a single level below a prefix
+        
+        Args:
+            prefix: Prefix to list
+            
+        Returns:
+            Tuple of (object entries directly under the prefix, sub-prefixes)
+        """
+        paginator = self.s3.get_paginator('list_objects_v2')
+        objects = []
+        sub_prefixes = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter='/'):
+            objects.extend(page.get('Contents', []))
+            sub_prefixes.extend(item['Prefix'] for item in page.get('CommonPrefixes', []))
+        return objects, sub_prefixes
+    
+    def _list_all(self, prefix):
+        """
+        List every object below a prefix
+        
+        The listing entries already carry Size, LastModified and ETag, so no
+        per-object head_object calls are needed.
+        
+        Args:
+            prefix: Prefix to list
+            
+        Returns:
+            List of object entries
+        """
+        paginator = self.s3.get_paginator('list_objects_v2')
+        objects = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            objects.extend(page.get('Contents', []))
+        return objects
+
+
+def _credential_cache_key(region):
+    """
+    Build a key identifying the region and the credentials in use, without calling AWS
+    
+    Args:
+        region: AWS region
+        
+    Returns:
+        Hex digest of the region, profile and access key ID
+    """
+    source = "|".join([
+        region,
+        os.environ.get("AWS_PROFILE", ""),
+        os.environ.get("AWS_ACCESS_KEY_ID", "")
+    ])
+    return hashlib.sha256(source.encode()).hexdigest()
 
 
+def _cache_verified_identity(func):
+    """
+    Cache successful credential verification on disk for CREDENTIAL_CACHE_TTL seconds
+    
+    Args:
+        func: Function taking a region and returning (success, identity_info)
+        
+    Returns:
+        Wrapped function
+    """
+    @functools.wraps(func)
+    def wrapper(region="us-east-1"):
+        cache_key = _credential_cache_key(region)
+        
+        try:
+            with open(CREDENTIAL_CACHE_PATH, "r") as f:
+                cached = json.load(f)
+            if cached.get("key") == cache_key and cached.get("expires", 0) > time.time():
+                identity = cached["identity"]
+                logger.info("AWS credentials verified (cached) - logged in as: %s", identity['Arn'])
+                return True, identity
+        except (OSError, ValueError, KeyError):
+            pass  # No usable cache entry, verify with STS
+        
+        verified, identity = func(region)
+        
+        if verified:
+            try:
+                os.makedirs(os.path.dirname(CREDENTIAL_CACHE_PATH), exist_ok=True)
+                with open(CREDENTIAL_CACHE_PATH, "w") as f:
+                    json.dump({
+                        "key": cache_key,
+                        "expires": time.time() + CREDENTIAL_CACHE_TTL,
+                        "identity": {k: identity[k] for k in ("UserId", "Account", "Arn")}
+                    }, f)
+            except OSError:
+                pass  # Caching is best effort
+        
+        return verified, identity
+    
+    return wrapper
+
+
+@_cache_verified_identity
 def verify_aws_credentials(region="us-east-1"):
     """
     Verify that AWS credentials are properly configured
     
+    A successful result is cached for CREDENTIAL_CACHE_TTL seconds per region and credentials.
+    
     Args:
         region: AWS region
         
@@ -140,16 +494,16 @@ def verify_aws_credentials(region="us-east-1"):
         # Try to get caller identity - this will fail if credentials are not set up
         sts = boto3.client('sts', region_name=region)
         identity = sts.get_caller_identity()
-        print(f"AWS credentials verified - logged in as: {identity['Arn']}")
+        logger.info("AWS credentials verified - logged in as: %s", identity['Arn'])
         return True, identity
     except Exception as e:
-        print("AWS credential error:", str(e))
-        print("\nPlease make sure your AWS credentials are properly configured.")
-        print("You can set up credentials using one of these methods:")
-        print("1. Run 'aws configure' to set up credentials")
-        print("2. Set environment variables AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY")
-        print("3. Create a .env file with AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY")
-        print("4. Configure IAM role if running on AWS infrastructure")
+        logger.error("AWS credential error: %s", e)
+        logger.info("Please make sure your AWS credentials are properly configured.")
+        logger.info("You can set up credentials using one of these methods:")
+        logger.info("1. Run 'aws configure' to set up credentials")
+        logger.info("2. Set environment variables AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY")
+        logger.info("3. Create a .env file with AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY")
+        logger.info("4. Configure IAM role if running on AWS infrastructure")
         return False, None
 
 
@@ -176,23 +530,17 @@ def setup_aws_credentials():
     
     try:
         # Read existing .env file
-        env_content = {}
-        if os.path.exists(env_file_path):
-            with open(env_file_path, "r") as f:
-                for line in f:
-                    if "=" in line and not line.startswith("#"):
-                        key, value = line.strip().split("=", 1)
-                        env_content[key] = value
-        
-        # Update with new credentials
-        env_content["AWS_ACCESS_KEY_ID"] = aws_access_key
-        env_content["AWS_SECRET_ACCESS_KEY"] = aws_secret_key
-        env_content["AWS_REGION"] = aws_region
-        
-        # Write back to .env file
-        with open(env_file_path, "w") as f:
-            for key, value in env_content.items():
-                f.write(f"{key}={value}\n")
+        env_content = dotenv_values(env_file_path) if os.path.exists(env_file_path) else {}
+        
+        # Update only the keys that changed; set_key keeps comments and line order
+        credentials = {
+            "AWS_ACCESS_KEY_ID": aws_access_key,
+            "AWS_SECRET_ACCESS_KEY": aws_secret_key,
+            "AWS_REGION": aws_region
+        }
+        for key, value in credentials.items():
+            if env_content.get(key) != value:
+                set_key(env_file_path, key, value, quote_mode="never")
         
         print(f"Credentials saved to {env_file_path}")
         
@@ -200,7 +548,7 @@ def setup_aws_credentials():
         return verify_aws_credentials(aws_region)[0]
         
     except Exception as e:
-        print(f"Error saving credentials: {str(e)}")
+        logger.error("Error saving credentials: %s", e)
         return False
 
 
@@ -210,6 +558,7 @@ def main():
     load_dotenv()
     
     import argparse
+    from logging_config import configure_logging
     parser = argparse.ArgumentParser(description="Upload documents to S3 for AWS Bedrock Knowledge Base")
     parser.add_argument("--bucket", required=True, help="S3 bucket name")
     parser.add_argument("--prefix", default="documents/", help="S3 prefix/folder")
@@ -218,8 +567,16 @@ def main():
     parser.add_argument("--list", action="store_true", help="List existing files in bucket")
     parser.add_argument("--region", default=os.environ.get("AWS_REGION", "us-east-1"), help="AWS region name")
     parser.add_argument("--setup", action="store_true", help="Set up AWS credentials")
+    parser.add_argument("--verbose", action="store_true", help="Log every uploaded file")
+    parser.add_argument("--workers", type=int, default=DEFAULT_UPLOAD_WORKERS,
+                        help="Number of files to upload in parallel")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="Maximum number of parallel multipart upload threads per large file")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_MULTIPART_CHUNKSIZE // MiB,
+                        help="Multipart upload chunk size in MiB (16-64 recommended)")
     
     args = parser.parse_args()
+    configure_logging(args.verbose)
     
     # Handle setup request
     if args.setup:
@@ -242,20 +599,28 @@ def main():
     
     try:
         print(f"Using AWS region: {args.region}")
-        uploader = S3Uploader(args.bucket, args.prefix, args.region)
+        transfer_config = make_transfer_config(
+            max_concurrency=args.max_concurrency,
+            multipart_chunksize=args.chunk_size * MiB
+        )
+        uploader = S3Uploader(args.bucket, args.prefix, args.region, transfer_config=transfer_config,
+                              max_workers=args.workers)
         
         if args.list:
-            files = uploader.list_bucket_contents()
+            files = uploader.list_bucket_contents_parallel(include_metadata=True)
             print(f"\nFiles in s3://{args.bucket}/{args.prefix}:")
             for file in files:
-                print(f" - {file}")
+                modified = file['LastModified'].strftime('%Y-%m-%d %H:%M:%S')
+                print(f" - {file['Key']} ({file['Size']} bytes, modified {modified})")
         
         if args.path:
             path = Path(args.path)
             if path.is_dir():
                 uploader.upload_directory(path, recursive=args.recursive)
             elif path.is_file():
-                uploader.upload_file(path)
+                success, s3_key = uploader.upload_file(path)
+                if success:
+                    print(f"Uploaded {path} to s3://{args.bucket}/{s3_key}")
             else:
                 print(f"Error: Path {path} not found")
     
@@ -1,7 +1,7 @@
 import os
 import boto3
 import sys
-from dotenv import load_dotenv
+from dotenv import load_dotenv, set_key
 
 def setup_aws_credentials():
     """
@@ -25,12 +25,10 @@ def setup_aws_credentials():
         aws_secret_key = input("AWS Secret Access Key: ")
         aws_region = input("AWS Region (default: us-east-1): ") or "us-east-1"
         
-        # Save to .env file
-        with open(".env", "a") as env_file:
-            env_file.write(f"\n# AWS Credentials\n")
-            env_file.write(f"AWS_ACCESS_KEY_ID={aws_access_key}\n")
-            env_file.write(f"AWS_SECRET_ACCESS_KEY={aws_secret_key}\n")
-            env_file.write(f"AWS_REGION={aws_region}\n")
+        # Save to .env file, replacing existing entries in place instead of appending duplicates
+        set_key(".env", "AWS_ACCESS_KEY_ID", aws_access_key, quote_mode="never")
+        set_key(".env", "AWS_SECRET_ACCESS_KEY", aws_secret_key, quote_mode="never")
+        set_key(".env", "AWS_REGION", aws_region, quote_mode="never")
         
         print("Credentials saved to .env file")
         